@@ -1,36 +1,96 @@
-from flask import Flask, render_template, g, request, jsonify
+from flask import Flask, render_template, g, request, jsonify, redirect, send_file, abort, url_for
+from werkzeug.http import http_date, is_resource_modified
+import base64
+import functools
+import hashlib
+import json
 import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 from pathlib import Path
 
+import car_details
+import database
+import enrich_queue
+import image_cache
+import price_stats
+import search
+
 app = Flask(__name__)
 
 BASE_DIR = Path(__file__).parent.resolve()
 DB_PATH = BASE_DIR / "cars.db"
 
 def get_db():
+    """This request's connection (WAL, busy_timeout, statement cache), closed on teardown"""
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DB_PATH)
-        db.row_factory = sqlite3.Row
+        db = g._database = database.get_connection(DB_PATH)
     return db
 
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    # The threaded dev server runs every request on a new thread: close its connection
+    # (rolling back a transaction left open by an error) instead of leaving one per thread
+    if getattr(g, '_database', None) is not None:
+        database.close_connection(DB_PATH)
+
+# The grid only needs these; heavy text lives in car_details
+LISTING_COLUMNS = ("id", "title", "price_uah", "image_url", "ad_url", "created_at", "is_favorite")
+PAGE_SIZE = 48
+MAX_PAGE_SIZE = 200
+
+# Rendered responses keyed on (path, normalized args); valid while database.change_counter stays the same
+RESPONSE_CACHE_SIZE = 256
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
 
 def init_db_updates():
-    """Automatically adds is_favorite column if missing"""
-    with app.app_context():
-        db = get_db()
-        cur = db.cursor()
-        try:
-            cur.execute("SELECT is_favorite FROM cars LIMIT 1")
-        except sqlite3.OperationalError:
-            print("🛠 Migration: adding 'is_favorite' column...")
-            cur.execute("ALTER TABLE cars ADD COLUMN is_favorite INTEGER DEFAULT 0")
-            db.commit()
+    """Applies pending schema migrations (database.MIGRATIONS)"""
+    database.init(DB_PATH)
+
+def normalized_args(args) -> tuple:
+    """?b=2&a=1&q= and ?a=1&b=2 are the same page: sorted, stripped, empty values dropped"""
+    return tuple(sorted((key, value.strip()) for key, value in args.items(multi=True) if value.strip()))
+
+def cached_view(view):
+    """
+    Serves a GET view from the response cache until a writer changes what the page shows
+    (change_counter is bumped by triggers in every process), and answers 304 to browsers that
+    already have this version: ETag = counter version + args, Last-Modified = time of the change.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version, changed_at = database.change_counter(get_db())
+        changed_at = datetime.fromtimestamp(changed_at, timezone.utc)
+        key = (request.path, normalized_args(request.args))
+        etag = f"{version}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}"
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=changed_at):
+            response = app.response_class(status=304)
+        else:
+            with _response_cache_lock:
+                hit = _response_cache.get(key)
+                if hit is not None:
+                    _response_cache.move_to_end(key)
+            if hit is not None and hit[0] == version:
+                response = app.response_class(hit[1], mimetype=hit[2])
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                with _response_cache_lock:
+                    _response_cache[key] = (version, response.get_data(), response.mimetype)
+                    _response_cache.move_to_end(key)
+                    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                        _response_cache.popitem(last=False)
+
+        response.set_etag(etag)
+        response.headers['Last-Modified'] = http_date(changed_at)
+        response.cache_control.no_cache = True  # the browser keeps the copy, but asks (and gets a 304) every time
+        return response
+    return wrapper
 
 @app.route('/toggle_favorite/<car_id>', methods=['POST'])
 def toggle_favorite(car_id):
@@ -44,62 +104,198 @@ def toggle_favorite(car_id):
         SET is_favorite = CASE WHEN is_favorite = 1 THEN 0 ELSE 1 END 
         WHERE id = ?
     """, (car_id,))
-    db.commit()
     
     # Get new status
     cur.execute("SELECT is_favorite FROM cars WHERE id = ?", (car_id,))
     row = cur.fetchone()
     new_status = row['is_favorite'] if row else 0
+
+    # Favorites are re-checked by the enricher right away, then every 15 minutes
+    if row:
+        enrich_queue.set_favorite(db, car_id, new_status == 1)
+    db.commit()
     
     # FIXED: variable name was wrong in previous version
     return jsonify({'status': 'success', 'is_favorite': new_status})
 
-@app.route('/')
-def index():
-    # Filter parameters
-    min_price = request.args.get('min_price')
-    max_price = request.args.get('max_price')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    show_favorites = request.args.get('show_favorites')
-
-    query = "SELECT * FROM cars WHERE image_url IS NOT NULL"
+@app.route('/car/<car_id>/details')
+def car_detail(car_id):
+    """Description, params and photos of one ad, unpacked from car_details on demand"""
+    details = car_details.load(get_db(), car_id)
+    if details is None:
+        abort(404)
+    return jsonify(details)
+
+@app.route('/thumb/<car_id>')
+def thumb(car_id):
+    """Card thumbnail from the local cache; on a miss the browser gets the CDN URL and we cache it in the background"""
+    row = get_db().execute("SELECT image_url FROM cars WHERE id = ?", (car_id,)).fetchone()
+    if row is None or not row['image_url']:
+        abort(404)
+    path = image_cache.cache.lookup(row['image_url'])
+    try:
+        # without Pillow the cached file is whatever the CDN sent (often WebP/PNG), not always JPEG
+        mimetype = image_cache.content_type(path) if path else None
+    except OSError:
+        mimetype = None  # evicted between lookup and read
+    if mimetype is None:
+        image_cache.cache.prefetch_async([row['image_url']])
+        return redirect(row['image_url'])
+    return send_file(path, mimetype=mimetype, max_age=86400)
+
+def get_regions():
+    """Regions for the filter dropdown (served from idx_cars_region_id)"""
+    try:
+        cur = get_db().execute("""
+            SELECT region_id, MAX(region_name) AS region_name
+            FROM cars
+            WHERE region_id IS NOT NULL
+            GROUP BY region_id
+            ORDER BY region_name
+        """)
+        return cur.fetchall()
+    except sqlite3.OperationalError:
+        # Monitor has not added typed columns yet
+        return []
+
+def listing_filters(args):
+    """Filter form / query string -> SQL conditions; every one is served by an index"""
+    # Closed ads are kept with closed_at for analytics, hide them here
+    where = ["image_url IS NOT NULL", "closed_at IS NULL"]
     params = []
 
+    min_price = args.get('min_price')
     if min_price and min_price.isdigit():
-        query += " AND price_uah >= ?"
+        where.append("price_uah >= ?")
         params.append(int(min_price))
-    
+
+    max_price = args.get('max_price')
     if max_price and max_price.isdigit():
-        query += " AND price_uah <= ?"
+        where.append("price_uah <= ?")
         params.append(int(max_price))
 
-    if start_date:
-        query += " AND created_at >= ?"
-        params.append(start_date)
+    if args.get('start_date'):
+        where.append("created_at >= ?")
+        params.append(args['start_date'])
+
+    if args.get('end_date'):
+        where.append("created_at <= ?")
+        params.append(args['end_date'] + "T23:59:59")
+
+    if args.get('show_favorites') == '1':
+        where.append("is_favorite = 1")
+
+    region_id = args.get('region_id')
+    if region_id and region_id.isdigit():
+        where.append("region_id = ?")
+        params.append(int(region_id))
+
+    # Full-text search: title, city/region, description and params through cars_fts
+    text = search.condition(args.get('q'))
+    if text:
+        where.append(text[0])
+        params.extend(text[1])
+
+    return where, params
+
+def encode_cursor(row) -> str:
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    if end_date:
-        query += " AND created_at <= ?"
-        params.append(end_date + "T23:59:59")
+def decode_cursor(cursor: str):
+    try:
+        created_at, car_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(created_at), str(car_id)
+    except (ValueError, TypeError):
+        abort(400, description="bad cursor")
 
-    if show_favorites == '1':
-        query += " AND is_favorite = 1"
+def fetch_page(args, cursor: str = None, limit: int = PAGE_SIZE):
+    """
+    One page newest-first. Keyset pagination: the next page starts right after the
+    (created_at, id) of the last row, so page 100 costs the same index range read as page 1.
+    Returns (rows, next_cursor or None).
+    """
+    where, params = listing_filters(args)
+    if cursor:
+        where.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    rows = get_db().execute(f"""
+        SELECT {', '.join(LISTING_COLUMNS)} FROM cars
+        WHERE {' AND '.join(where)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, (*params, limit + 1)).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+@app.route('/api/cars')
+@cached_view
+def api_cars():
+    """Keyset-paginated listing for infinite scroll: ?cursor=<next_cursor>&limit=N + the index filters"""
+    limit = request.args.get('limit', '')
+    limit = min(int(limit), MAX_PAGE_SIZE) if limit.isdigit() and int(limit) > 0 else PAGE_SIZE
+    rows, next_cursor = fetch_page(request.args, request.args.get('cursor'), limit)
+    image_cache.cache.prefetch_async(row['image_url'] for row in rows)
+    return jsonify({
+        'cars': [{**dict(row), 'thumb_url': url_for('thumb', car_id=row['id'])} for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+@app.route('/api/search')
+@cached_view
+def api_search():
+    """Best matches first (bm25 over cars_fts): ?q=passat дизель&limit=N + the index filters"""
+    limit = request.args.get('limit', '')
+    limit = min(int(limit), MAX_PAGE_SIZE) if limit.isdigit() and int(limit) > 0 else PAGE_SIZE
+    where, params = listing_filters({k: v for k, v in request.args.items() if k != 'q'})
+    rows = search.ranked(get_db(), request.args.get('q', ''), LISTING_COLUMNS, where, params, limit)
+    return jsonify({
+        'cars': [{**dict(row), 'thumb_url': url_for('thumb', car_id=row['id'])} for row in rows],
+    })
+
+def market_stats(args, make=None) -> dict:
+    region_id = args.get('region_id')
+    return price_stats.summary(
+        get_db(), int(region_id) if region_id and region_id.isdigit() else None,
+        make or args.get('make'), args.get('start_date'), args.get('end_date'),
+    )
+
+@app.route('/api/stats')
+@cached_view
+def api_stats():
+    """Precomputed price stats: ?region_id=&make=&start_date=&end_date=[&by=day|region|make]"""
+    by = request.args.get('by')
+    if by is None:
+        return jsonify(market_stats(request.args))
+    if by not in ('day', 'region', 'make'):
+        abort(400, description="by must be day, region or make")
+    region_id = request.args.get('region_id')
+    return jsonify(price_stats.breakdown(
+        get_db(), by, int(region_id) if region_id and region_id.isdigit() else None, request.args.get('make'),
+    ))
+
+@app.route('/')
+@cached_view
+def index():
+    cars, next_cursor = fetch_page(request.args)
 
-    query += " ORDER BY created_at DESC LIMIT 300"
+    regions = get_regions()
 
-    cur = get_db().cursor()
-    cur.execute(query, params)
-    cars = cur.fetchall()
+    # Thumbnails not cached yet are fetched in the background, next render is served locally
+    image_cache.cache.prefetch_async(c['image_url'] for c in cars)
 
-    # --- PRICE ANALYTICS ---
-    prices = [c['price_uah'] for c in cars if c['price_uah'] and c['price_uah'] > 0]
-    avg_price = sum(prices) / len(prices) if prices else 0
+    # --- PRICE ANALYTICS --- market for the region/dates, precomputed in price_stats
+    stats = market_stats(request.args)
 
-    return render_template('index.html', cars=cars, 
-                           min_price=min_price, max_price=max_price,
-                           start_date=start_date, end_date=end_date,
-                           show_favorites=show_favorites,
-                           avg_price=int(avg_price))
+    return render_template('index.html', cars=cars, next_cursor=next_cursor, stats=stats,
+                           min_price=request.args.get('min_price'),
+                           max_price=request.args.get('max_price'),
+                           start_date=request.args.get('start_date'),
+                           end_date=request.args.get('end_date'),
+                           show_favorites=request.args.get('show_favorites'),
+                           region_id=request.args.get('region_id'), regions=regions,
+                           q=request.args.get('q'),
+                           avg_price=stats['mean'] or 0)
 
 if __name__ == '__main__':
     init_db_updates()
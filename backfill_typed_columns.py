@@ -0,0 +1,78 @@
+import ast
+import time
+
+import database
+import price_stats
+from olx_monitor import DB_PATH, init_db, parse_location, parse_price_flags
+
+
+# =============================
+# 🔁 РАЗОВИЙ BACKFILL ТИПІЗОВАНИХ КОЛОНОК
+# =============================
+# Старі рядки мають лише location_raw / price_raw у вигляді repr() Python-словника.
+# Йдемо по таблиці пачками за rowid (без завантаження всієї таблиці в пам'ять)
+# і заповнюємо city_id, region_id, negotiable тощо. Можна переривати і запускати знову.
+# Агрегати price_stats рахувались ще з region_id = NULL (UNKNOWN_REGION) - кожна пачка
+# переносить свої оголошення в їхні області в тій самій транзакції.
+
+BATCH_SIZE = 1000
+
+
+def parse_repr(raw):
+    if not raw or raw == "None":
+        return None
+    try:
+        return ast.literal_eval(raw)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def backfill():
+    init_db()
+    conn = database.connect(DB_PATH, row_factory=None)
+    last_rowid = 0
+    updated = 0
+    started = time.perf_counter()
+
+    while True:
+        rows = conn.execute("""
+            SELECT rowid, id, location_raw, price_raw FROM cars
+            WHERE rowid > ? AND region_id IS NULL AND location_raw IS NOT NULL
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+
+        batch = []
+        for rowid, _, location_raw, price_raw in rows:
+            loc = parse_location(parse_repr(location_raw))
+            flags = parse_price_flags(parse_repr(price_raw))
+            batch.append((
+                loc["city_id"], loc["city_name"], loc["district_id"],
+                loc["region_id"], loc["region_name"],
+                flags["negotiable"], flags["trade"], rowid,
+            ))
+
+        car_ids = [row[1] for row in rows]
+        with conn:
+            price_stats.remove_cars(conn, car_ids)
+            conn.executemany("""
+                UPDATE cars SET
+                    city_id = ?, city_name = ?, district_id = ?,
+                    region_id = ?, region_name = ?,
+                    negotiable = ?, trade = ?
+                WHERE rowid = ?
+            """, batch)
+            price_stats.add_cars(conn, car_ids)
+
+        updated += len(batch)
+        last_rowid = rows[-1][0]
+        print(f"   ... {updated} рядків")
+
+    conn.close()
+    print(f"✅ Backfill завершено: {updated} рядків за {time.perf_counter() - started:.1f} сек")
+
+
+if __name__ == "__main__":
+    backfill()
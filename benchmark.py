@@ -0,0 +1,967 @@
+import argparse
+import contextlib
+import csv
+import heapq
+import io
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+import car_details
+import database
+import fake_olx
+import enrich_queue
+import image_cache
+import olx_enricher
+import olx_monitor
+import price_stats
+import rate_limiter
+import search
+import stop_words
+import telegram_notifier
+
+
+# =============================
+# 📊 БЕНЧМАРКИ
+# =============================
+# Запуск: python benchmark.py fetch [--latency 0.3] [--rounds 5]
+#         python benchmark.py ingest [--offers 100000]
+#         python benchmark.py stopwords [--repeat 200]
+#         python benchmark.py e2e [--sizes 1000 10000 100000] [--latency 0.05] [--error-rate 0.01]
+#         python benchmark.py revisit [--ads 200] [--pad-kb 300]
+#         python benchmark.py parse [--corpus fixtures/ads] [--pages 40]
+#         python benchmark.py pool [--ads 300] [--workers 1 4 8] [--latency 0.2]
+#         python benchmark.py source [--ads 200] [--pad-kb 300]
+#         python benchmark.py revisit-policy [--ads 3000] [--budget 300] [--days 14]
+#         python benchmark.py stream [--ads 100] [--head-share 0.1]
+#         python benchmark.py images [--ads 240] [--latency 0.05]
+#         python benchmark.py split [--ads 20000]
+#         python benchmark.py listing [--ads 200000] [--depth 4000]
+#         python benchmark.py stats [--ads 100000]
+#         python benchmark.py search [--ads 100000]
+#         python benchmark.py cache [--ads 20000]
+
+def timed(fn, rounds: int) -> list:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def report(label: str, samples: list):
+    print(f"   {label:<34} median {statistics.median(samples) * 1000:8.1f} ms"
+          f"   min {min(samples) * 1000:8.1f} ms")
+
+
+# -----------------------------
+# 🌐 fetch: послідовно vs паралельно з пулом
+# -----------------------------
+def bench_fetch(args):
+    offsets = olx_monitor.FETCH_CONFIG["offsets"]
+    delay = olx_monitor.FETCH_CONFIG["sequential_delay"]
+
+    with fake_olx.FakeOLXServer(latency=args.latency) as srv, tempfile.TemporaryDirectory() as tmp:
+        olx_monitor.API_URL = srv.offers_url
+        # Міряємо чистий час запитів, без спільного бюджету запитів
+        rate_limiter.limiter = rate_limiter.SharedRateLimiter(
+            Path(tmp) / "ratelimit.db", limits={}, default_limit={"rate": 0, "burst": 1}
+        )
+        print(f"🧪 Fake OLX {srv.offers_url}, latency {args.latency * 1000:.0f} ms, offsets {offsets}")
+
+        def legacy():
+            # Стара поведінка: новий requests.get (нове з'єднання) на кожну сторінку
+            for offset in offsets:
+                r = requests.get(srv.offers_url, params=olx_monitor.build_params(offset), timeout=15)
+                r.json()
+
+        def concurrent():
+            for _, r in olx_monitor.fetch_pages(offsets):
+                r.json()
+
+        legacy_samples = timed(legacy, args.rounds)
+        concurrent_samples = timed(concurrent, args.rounds)
+
+    report("sequential, no pool", legacy_samples)
+    report("concurrent, pooled session", concurrent_samples)
+    avg_sleep = sum(delay) / 2 * len(offsets)
+    print(f"   + у sequential режимі ще ~{avg_sleep:.0f} сек пауз між запитами на кожен цикл")
+    print(f"   Прискорення без урахування пауз: "
+          f"x{statistics.median(legacy_samples) / statistics.median(concurrent_samples):.1f}")
+
+
+# -----------------------------
+# 💾 ingest: save_car_and_verify vs save_cars_batch
+# -----------------------------
+def save_car_and_verify(db_path: Path, car: dict) -> bool:
+    """
+    Як olx_monitor писав оголошення до save_cars_batch: своє з'єднання, коміт і SELECT на кожне.
+    database.connect замість sqlite3.connect (тригерам cars_fts потрібна car_detail_text), а черга
+    і price_stats - щоб робота на рядок була та сама, що в save_cars_batch.
+    """
+    conn = database.connect(db_path)
+    cur = conn.cursor()
+    start_changes = conn.total_changes
+
+    cur.execute("""
+        INSERT OR IGNORE INTO cars (
+            id, title, price_value, price_currency, price_uah,
+            price_raw, location_raw, image_url, ad_url, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        car["id"], car["title"], car["price_value"], car["price_currency"],
+        car["price_uah"], car["price_raw"], car["location_raw"],
+        car["image_url"], car["ad_url"], car["created_at"],
+    ))
+    was_inserted = (conn.total_changes > start_changes)
+    if was_inserted:
+        enrich_queue.enqueue_new(conn, [car["id"]])
+        price_stats.add_cars(conn, [car["id"]])
+    conn.commit()
+
+    if was_inserted:
+        row = cur.execute("SELECT * FROM cars WHERE id = ?", (car['id'],)).fetchone()
+        if row:
+            print(f"\n💾 [SAVED] ID: {row['id']}")
+            print(f"   📅 Date:  {row['created_at']}")
+            print(f"   💰 Price: {row['price_uah']} UAH")
+            print("-" * 50)
+
+    conn.close()
+    return was_inserted
+
+def bench_ingest(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        olx_monitor.DB_PATH = Path(tmp) / "bench.db"
+        olx_monitor.init_db()
+
+        cars = [olx_monitor.offer_to_car(fake_olx.make_offer(n)) for n in range(args.offers)]
+        cars = [car for car in cars if car]
+        print(f"🧪 Replay: {len(cars)} оголошень, сторінки по {args.page_size}")
+
+        # Стара схема: з'єднання + коміт + SELECT на кожне оголошення
+        sample = cars[:args.baseline_sample]
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for car in sample:
+                save_car_and_verify(olx_monitor.DB_PATH, car)
+        legacy_rate = len(sample) / (time.perf_counter() - started)
+
+        # Нова: одна транзакція на сторінку. Перший прохід - вставка, другий - повтор тих самих сторінок
+        for label in ("batch, insert", "batch, replay (all known)"):
+            olx_monitor.INGEST_STATS.update(rows=0, new=0, batches=0, seconds=0.0)
+            for i in range(0, len(cars), args.page_size):
+                olx_monitor.save_cars_batch(cars[i:i + args.page_size])
+            stats = olx_monitor.INGEST_STATS
+            print(f"   {label:<28} {olx_monitor.ingest_throughput():10.0f} rows/s"
+                  f"   new {stats['new']}, {stats['batches']} транзакцій")
+
+    print(f"   {'save_car_and_verify':<28} {legacy_rate:10.0f} rows/s   (вибірка {len(sample)})")
+
+
+# -----------------------------
+# 🛑 stopwords: any(word in title) vs скомпільований matcher
+# -----------------------------
+# Список, який був зашитий в olx_monitor.STOP_WORDS до stop_words.txt - з ним порівнюємо,
+# що старий спосіб пропускав (слова з великої літери проти title.lower(), апострофи).
+LEGACY_STOP_WORDS = [
+    "трактор", "мотоблок", "причіп", "прицеп", "скутер", "Купави", "кав’ярні",
+    "мотоцикл", "квадроцикл", "навантажувач", "погрузчик",
+    "комбайн", "запчастини", "розборка", "шрот", "двигун",
+    "кпп", "сівалка", "плуг", "борона", "мопед", "велосипед",
+    "scooter", "moto", "atv", "tractor", "разборка", "Баштовий кран", "Посівний комплекс", "грузовий",
+    "косарка", "шнек", "погрузчик", "бочка", "цистерна", "прицеп", "причіп", "трейлер", "телега",
+    "пропелер", "гідроборт",
+    "диски", "шини", "резина", "колеса", "мотор", "двигатель",
+    "акпп", "двері", "крило", "бампер", "фари", "салон",
+]
+
+def bench_stopwords(args):
+    with open(olx_monitor.BASE_DIR / "olx_data.csv", encoding="utf-8-sig", newline="") as f:
+        titles = [row["title"] for row in csv.DictReader(f, delimiter=";") if row.get("title")]
+
+    words = stop_words.load_words(olx_monitor.STOP_WORDS_PATH)
+    matcher = stop_words.StopWordMatcher(olx_monitor.STOP_WORDS_PATH)
+    corpus = titles * args.repeat
+
+    def legacy_match(title):
+        return any(word in title.lower() for word in LEGACY_STOP_WORDS)
+
+    def legacy():
+        return sum(1 for t in corpus if legacy_match(t))
+
+    def compiled():
+        return sum(1 for t in corpus if matcher.matches(t))
+
+    print(f"🧪 {len(titles)} заголовків з olx_data.csv x{args.repeat}, "
+          f"{len(LEGACY_STOP_WORDS)} стоп-слів у старому списку, {len(words)} у stop_words.txt")
+    legacy_samples = timed(legacy, args.rounds)
+    compiled_samples = timed(compiled, args.rounds)
+    report("any(word in title.lower())", legacy_samples)
+    report("StopWordMatcher", compiled_samples)
+    print(f"   На заголовок: {statistics.median(legacy_samples) / len(corpus) * 1e6:.2f} us -> "
+          f"{statistics.median(compiled_samples) / len(corpus) * 1e6:.2f} us")
+
+    missed = [t for t in titles if matcher.matches(t) and not legacy_match(t)]
+    dropped = [t for t in titles if legacy_match(t) and not matcher.matches(t)]
+    print(f"   Спрацювань: {sum(map(matcher.matches, titles))} (старий спосіб пропускав {len(missed)}, "
+          f"ловив зайве або прибране з файлу {len(dropped)})")
+
+
+# -----------------------------
+# 🔁 e2e: монітор -> збагачувач -> Telegram на фейковому сервері
+# -----------------------------
+def use_temp_db(tmp: str, name: str) -> Path:
+    """Всі модулі пишуть в одну тимчасову БД, ліміт запитів вимкнено."""
+    database.close_all()  # з'єднання з попередньою тимчасовою базою
+    db_path = Path(tmp) / f"{name}.db"
+    olx_monitor.DB_PATH = db_path
+    olx_enricher.DB_PATH = db_path
+    olx_enricher.ENRICH_STATS.update({key: 0 for key in olx_enricher.ENRICH_STATS})
+    telegram_notifier.DB_PATH = db_path
+    rate_limiter.limiter = rate_limiter.SharedRateLimiter(
+        Path(tmp) / f"{name}-ratelimit.db", limits={}, default_limit={"rate": 0, "burst": 1},
+        backoff={"base": 0.05, "max": 1, "breaker_cooldown": 1},
+    )
+    # мініатюри - у тимчасовий каталог і без фонових завантажень (міряє тільки bench_images)
+    image_cache.IMAGE_CACHE_CONFIG["prefetch_on_ingest"] = False
+    image_cache.cache = image_cache.ImageCache(Path(tmp) / f"{name}-images")
+    return db_path
+
+def use_fake_server(srv):
+    """Всі зовнішні адреси (OLX API, сторінки, Telegram) - на фейковий сервер."""
+    olx_monitor.API_URL = srv.offers_url
+    olx_enricher.OFFER_API_URL = srv.offers_url + "/{id}/"
+    telegram_notifier.TELEGRAM_API = srv.base_url
+
+def bench_e2e(args):
+    profile = {"name": "bench", "category_id": olx_monitor.CATEGORY_CARS_ID}
+    olx_monitor.FETCH_CONFIG.update(mode="concurrent", crawl="fixed", max_workers=args.workers)
+    results = []
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp, fake_olx.FakeOLXServer(
+            latency=args.latency, error_rate=args.error_rate, closed_rate=args.closed_rate,
+            total_offers=size, pad_kb=args.pad_kb,
+        ) as srv, contextlib.redirect_stdout(io.StringIO()):
+            db_path = use_temp_db(tmp, f"e2e-{size}")
+            use_fake_server(srv)
+            olx_monitor.FETCH_CONFIG["offsets"] = tuple(range(0, size, olx_monitor.FETCH_CONFIG["page_size"]))
+
+            # 1. Монітор: сторінки API -> cars
+            olx_monitor.init_db()
+            started = time.perf_counter()
+            ingested = olx_monitor.crawl_fixed(profile)
+            ingest_rate = ingested / (time.perf_counter() - started)
+
+            # 2. Збагачувач: вибірка оголошень, без людських пауз
+            olx_enricher.init_extended_db()
+            conn = database.connect(db_path)
+            rows = conn.execute(
+                "SELECT id, ad_url, title, is_favorite FROM cars ORDER BY created_at DESC LIMIT ?",
+                (args.sample,),
+            ).fetchall()
+            session = requests.Session()
+            started = time.perf_counter()
+            for row in rows:
+                try:
+                    olx_enricher.check_ad(session, conn, row)
+                except Exception:
+                    pass
+            enrich_rate = len(rows) / (time.perf_counter() - started)
+
+            # 3. Telegram
+            telegram_notifier.init_tg_db()
+            started = time.perf_counter()
+            sent = 0
+            while sent < args.sample:
+                batch = telegram_notifier.notify_pending(conn, limit=min(50, args.sample - sent), pause=0)
+                if not batch:
+                    break
+                sent += batch
+            notify_rate = sent / (time.perf_counter() - started)
+            conn.close()
+
+        results.append((size, ingest_rate, enrich_rate, notify_rate, srv.counters))
+
+    print(f"🧪 latency {args.latency * 1000:.0f} ms, errors {args.error_rate:.0%}, "
+          f"сторінка оголошення ~{args.pad_kb} КБ, вибірка збагачення/Telegram {args.sample}")
+    print(f"   {'ads':>8} {'ingest ads/s':>14} {'enrich ads/s':>14} {'notify/s':>10}")
+    for size, ingest_rate, enrich_rate, notify_rate, counters in results:
+        print(f"   {size:>8} {ingest_rate:>14.0f} {enrich_rate:>14.1f} {notify_rate:>10.1f}   {counters}")
+
+
+# -----------------------------
+# ♻️ revisit: повторна перевірка тих самих оголошень з ETag / Last-Modified
+# -----------------------------
+def bench_revisit(args):
+    with tempfile.TemporaryDirectory() as tmp, fake_olx.FakeOLXServer(
+        latency=args.latency, pad_kb=args.pad_kb,
+    ) as srv:
+        db_path = use_temp_db(tmp, "revisit")
+        olx_enricher.ENRICH_CONFIG["source"] = "html"
+        olx_monitor.init_db()
+        olx_enricher.init_extended_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.save_cars_batch([
+                olx_monitor.offer_to_car(fake_olx.make_offer(n, base_url=srv.base_url)) for n in range(args.ads)
+            ])
+
+        conn = database.connect(db_path)
+        session = requests.Session()
+        session.headers.update(olx_enricher.get_random_headers())
+        print(f"🧪 {args.ads} оголошень по ~{args.pad_kb} КБ, Accept-Encoding: {olx_enricher.ACCEPT_ENCODING}")
+        print(f"   {'прохід':<26} {'304':>5} {'трафік КБ':>10} {'тіло КБ':>10} {'парсинг s':>10} {'час s':>7}")
+
+        for label in ("перший (без валідаторів)", "повторний (умовний)"):
+            rows = conn.execute("SELECT id, ad_url, title, is_favorite, etag, last_modified FROM cars").fetchall()
+            before = dict(olx_enricher.ENRICH_STATS)
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for row in rows:
+                    olx_enricher.check_ad(session, conn, row)
+            elapsed = time.perf_counter() - started
+            delta = {k: v - before[k] for k, v in olx_enricher.ENRICH_STATS.items()}
+            print(f"   {label:<26} {delta['not_modified']:>5} {delta['wire_bytes'] / 1024:>10.0f} "
+                  f"{delta['body_bytes'] / 1024:>10.0f} {delta['parse_seconds']:>10.2f} {elapsed:>7.2f}")
+        conn.close()
+
+
+# -----------------------------
+# 🧩 parse: пошук __PRERENDERED_STATE__ посимвольно vs raw_decode
+# -----------------------------
+def legacy_extract_json(html_content):
+    """Стара версія olx_enricher.extract_json_smart: цикл по символах з підрахунком { }."""
+    start_idx = html_content.find("window.__PRERENDERED_STATE__=")
+    if start_idx == -1:
+        start_idx = html_content.find("window.__PRERENDERED_STATE__ =")
+        if start_idx == -1:
+            return None
+    json_start = html_content.find("{", start_idx)
+    if json_start == -1:
+        return None
+    balance = 0
+    for i in range(json_start, len(html_content)):
+        char = html_content[i]
+        if char == "{":
+            balance += 1
+        elif char == "}":
+            balance -= 1
+            if balance == 0:
+                try:
+                    return json.loads(html_content[json_start:i + 1])
+                except ValueError:
+                    return None
+    return None
+
+def parse_corpus(args) -> list:
+    """Збережені сторінки (fake_olx.py record) + синтетичні 300-600 КБ в обох формах стану."""
+    pages = []
+    if args.corpus:
+        pages += [(p.name, p.read_text(encoding="utf-8")) for p in sorted(Path(args.corpus).glob("*.html"))]
+    for n in range(args.pages):
+        ad = fake_olx.make_ad(n)
+        if n % 4 == 0:
+            ad["description"] += " Комплектація: {клімат, підігрів :) "  # незбалансована дужка в рядку
+        form = "string" if n % 2 else "object"
+        pages.append((f"synthetic-{n}-{form}", fake_olx.render_ad_page(ad, 300 + n % 2 * 300, form)))
+    return pages
+
+def bench_parse(args):
+    pages = parse_corpus(args)
+    total_kb = sum(len(html) for _, html in pages) / 1024
+    print(f"🧪 {len(pages)} сторінок, в середньому {total_kb / len(pages):.0f} КБ")
+
+    def ok(state):
+        return bool(state and state.get("ad", {}).get("ad"))
+
+    for label, extract in (("посимвольно { }", legacy_extract_json),
+                           ("raw_decode", olx_enricher.extract_json_smart)):
+        samples = timed(lambda: [extract(html) for _, html in pages], args.rounds)
+        parsed = sum(ok(extract(html)) for _, html in pages)
+        print(f"   {label:<20} {statistics.median(samples) / len(pages) * 1000:8.2f} ms/сторінка"
+              f"   розпізнано {parsed}/{len(pages)}")
+
+
+# -----------------------------
+# ⚡ pool: збагачувач по одному vs пул воркерів
+# -----------------------------
+def bench_pool(args):
+    with tempfile.TemporaryDirectory() as tmp, fake_olx.FakeOLXServer(
+        latency=args.latency, jitter=args.latency, pad_kb=args.pad_kb,
+    ) as srv:
+        db_path = use_temp_db(tmp, "pool")
+        use_fake_server(srv)
+        olx_monitor.init_db()
+        olx_enricher.init_extended_db()
+        cars = [olx_monitor.offer_to_car(fake_olx.make_offer(n, base_url=srv.base_url)) for n in range(args.ads)]
+        conn = database.connect(db_path)
+        print(f"🧪 {args.ads} оголошень, latency {args.latency * 1000:.0f}-{args.latency * 2000:.0f} ms")
+
+        for workers in args.workers:
+            # Кожен прогін на свіжих рядках, без валідаторів з попереднього
+            conn.execute("DELETE FROM cars")
+            conn.commit()
+            with contextlib.redirect_stdout(io.StringIO()):
+                olx_monitor.save_cars_batch(cars)
+            rows = conn.execute("SELECT id, ad_url, title, is_favorite, etag, last_modified FROM cars").fetchall()
+
+            olx_enricher.ENRICH_STATS.update(rows=0, pool_seconds=0.0)
+            olx_enricher.FETCH_LATENCIES.clear()
+            olx_enricher.ENRICH_CONFIG["workers"] = workers
+            olx_enricher._session = None
+            with contextlib.redirect_stdout(io.StringIO()):
+                olx_enricher.check_ads_pool(conn, rows)
+
+            stats = olx_enricher.ENRICH_STATS
+            latencies = sorted(olx_enricher.FETCH_LATENCIES)
+            print(f"   workers={workers:<3} {stats['rows'] / stats['pool_seconds'] * 60:8.0f} рядків/хв"
+                  f"   p50 {olx_enricher.percentile(latencies, 0.5) * 1000:5.0f} ms"
+                  f"   p95 {olx_enricher.percentile(latencies, 0.95) * 1000:5.0f} ms")
+        conn.close()
+    print("   (послідовний режим main_loop ще додає 3-8 сек паузи на кожне оголошення)")
+
+
+# -----------------------------
+# 🔌 source: JSON /api/v1/offers/{id} vs повна HTML-сторінка
+# -----------------------------
+def bench_source(args):
+    with tempfile.TemporaryDirectory() as tmp, fake_olx.FakeOLXServer(pad_kb=args.pad_kb) as srv:
+        db_path = use_temp_db(tmp, "source")
+        use_fake_server(srv)
+        olx_monitor.init_db()
+        olx_enricher.init_extended_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.save_cars_batch([
+                olx_monitor.offer_to_car(fake_olx.make_offer(n, base_url=srv.base_url)) for n in range(args.ads)
+            ])
+        conn = database.connect(db_path)
+        session = requests.Session()
+        session.headers.update(olx_enricher.get_random_headers())
+        print(f"🧪 {args.ads} оголошень, HTML-сторінка ~{args.pad_kb} КБ")
+
+        for source in ("html", "api"):
+            olx_enricher.ENRICH_CONFIG["source"] = source
+            olx_enricher.ENRICH_STATS.update({key: 0 for key in olx_enricher.ENRICH_STATS})
+            # без ETag, щоб порівнювати повні відповіді
+            rows = conn.execute("SELECT id, ad_url, title, is_favorite FROM cars").fetchall()
+            started = time.perf_counter()
+            for row in rows:
+                olx_enricher.fetch_ad(session, row)
+            elapsed = time.perf_counter() - started
+            stats = olx_enricher.ENRICH_STATS
+            wire = stats["wire_bytes"] + stats["api_wire_bytes"]
+            parse = stats["parse_seconds"] + stats["api_parse_seconds"]
+            print(f"   {source:<5} {wire / len(rows) / 1024:8.1f} КБ/оголошення   "
+                  f"парсинг {parse / len(rows) * 1000:6.2f} ms   "
+                  f"{len(rows) / elapsed:6.1f} оголошень/с   fallback в HTML: {stats['api_fallbacks']}")
+        conn.close()
+
+
+# -----------------------------
+# ⏳ revisit-policy: round-robin по last_full_check vs адаптивні інтервали (симуляція)
+# -----------------------------
+def simulate_ads(args) -> list:
+    """Синтетична популяція: кілька "гарячих" оголошень міняють ціну часто, решта майже ніколи."""
+    rnd = random.Random(args.seed)
+    horizon = args.days * 86400
+    ads = []
+    for i in range(args.ads):
+        hot = rnd.random() < args.hot_share
+        mean_gap = 6 * 3600 if hot else 30 * 86400
+        changes, t = [], rnd.expovariate(1 / mean_gap)
+        while t < horizon:
+            changes.append(t)
+            t += rnd.expovariate(1 / mean_gap)
+        closed_at = rnd.expovariate(1 / ((3 if hot else 20) * 86400))
+        ads.append({
+            "created_at": -rnd.uniform(0, 30 * 86400),
+            "price_uah": rnd.choice([150_000, 600_000, 2_000_000]),
+            "changes": changes,
+            "closed_at": closed_at if closed_at < horizon else None,
+        })
+    return ads
+
+def simulate_policy(ads: list, args, adaptive: bool) -> dict:
+    cfg = enrich_queue.QUEUE_CONFIG
+    horizon = args.days * 86400
+    step = 3600 / args.budget
+    seen = [0] * len(ads)  # скільки змін вже виявлено
+    interval = [cfg["min_interval"]] * len(ads)
+    alive = set(range(len(ads)))
+    heap = [(0.0, i) for i in range(len(ads))]
+    rr = list(range(len(ads)))
+    rr_pos = 0
+    change_lat, close_lat, checks = [], [], 0
+
+    t = 0.0
+    while t < horizon and alive:
+        if adaptive:
+            while heap and heap[0][1] not in alive:
+                heapq.heappop(heap)
+            if not heap or heap[0][0] > t:
+                t += step  # нічого не пора перевіряти - запит не витрачено
+                continue
+            _, i = heapq.heappop(heap)
+        else:
+            while rr[rr_pos % len(rr)] not in alive:
+                rr.pop(rr_pos % len(rr))
+            i = rr[rr_pos % len(rr)]
+            rr_pos += 1
+
+        ad = ads[i]
+        checks += 1
+        if ad["closed_at"] is not None and ad["closed_at"] <= t:
+            close_lat.append(t - ad["closed_at"])
+            alive.discard(i)
+            t += step
+            continue
+
+        new = [c for c in ad["changes"][seen[i]:] if c <= t]
+        change_lat += [t - c for c in new]
+        seen[i] += len(new)
+        if adaptive:
+            cap = enrich_queue.age_cap(t - ad["created_at"], ad["price_uah"])
+            interval[i] = enrich_queue.next_interval(interval[i], bool(new), cap)
+            heapq.heappush(heap, (t + interval[i], i))
+        t += step
+
+    def avg_h(samples):
+        return statistics.mean(samples) / 3600 if samples else 0.0
+    return {"checks": checks, "change": avg_h(change_lat), "close": avg_h(close_lat),
+            "changes": len(change_lat), "closes": len(close_lat)}
+
+def bench_revisit_policy(args):
+    ads = simulate_ads(args)
+    print(f"🧪 {args.ads} оголошень ({args.hot_share:.0%} гарячих), бюджет {args.budget} запитів/год, {args.days} днів")
+    print(f"   {'політика':<14} {'запитів':>9} {'зміна, год':>11} {'закриття, год':>14}")
+    adaptive = simulate_policy(ads, args, True)
+    spent = argparse.Namespace(**{**vars(args), "budget": max(1, round(adaptive["checks"] / (args.days * 24)))})
+    for label, r in (("round-robin", simulate_policy(ads, args, False)),
+                     (f"rr @ {spent.budget}/год", simulate_policy(ads, spent, False)),
+                     ("adaptive", adaptive)):
+        print(f"   {label:<14} {r['checks']:>9} {r['change']:>11.1f} {r['close']:>14.1f}"
+              f"   (виявлено змін {r['changes']}, закриттів {r['closes']})")
+    print("   adaptive не витрачає запити, коли нікому не пора; rr @ N - round-robin з тими ж витратами")
+    print("   закриття adaptive бачить через ~половину інтервалу: стеля age_caps - компроміс запити/затримка")
+
+# -----------------------------
+# ✂️ stream: повне завантаження сторінки vs потокове з обривом після стану
+# -----------------------------
+def bench_stream(args):
+    with tempfile.TemporaryDirectory() as tmp, fake_olx.FakeOLXServer(
+        latency=args.latency, pad_kb=args.pad_kb, head_share=args.head_share,
+    ) as srv:
+        db_path = use_temp_db(tmp, "stream")
+        use_fake_server(srv)
+        olx_monitor.init_db()
+        olx_enricher.init_extended_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.save_cars_batch([
+                olx_monitor.offer_to_car(fake_olx.make_offer(n, base_url=srv.base_url)) for n in range(args.ads)
+            ])
+        conn = database.connect(db_path)
+        rows = conn.execute("SELECT id, ad_url, title, is_favorite FROM cars").fetchall()
+        conn.close()
+        session = requests.Session()
+        session.headers.update(olx_enricher.get_random_headers())
+        olx_enricher.ENRICH_CONFIG["source"] = "html"
+        print(f"🧪 {args.ads} сторінок по ~{args.pad_kb} КБ, стан після {args.head_share:.0%} розмітки")
+        print(f"   {'режим':<10} {'трафік КБ':>10} {'прочитано КБ':>13} {'буфер КБ':>9} {'ms/оголошення':>14}")
+
+        for label, stream in (("повністю", False), ("потоково", True)):
+            olx_enricher.ENRICH_CONFIG["stream"] = stream
+            olx_enricher.ENRICH_STATS.update({key: 0 for key in olx_enricher.ENRICH_STATS})
+            started = time.perf_counter()
+            for row in rows:
+                olx_enricher.fetch_ad(session, row)
+            elapsed = time.perf_counter() - started
+            stats = olx_enricher.ENRICH_STATS
+            n = stats["parsed"]
+            # без потоку в пам'яті тримається все тіло (r.content + r.text)
+            peak = stats["stream_peak_bytes"] if stream else stats["body_bytes"]
+            print(f"   {label:<10} {stats['wire_bytes'] / n / 1024:>10.1f} {stats['body_bytes'] / n / 1024:>13.1f}"
+                  f" {peak / n / 1024:>9.1f} {elapsed / len(rows) * 1000:>14.1f}")
+
+
+# -----------------------------
+# 🖼 images: рендер сітки карток з CDN vs з кешу мініатюр
+# -----------------------------
+def bench_images(args):
+    with tempfile.TemporaryDirectory() as tmp, fake_olx.FakeOLXServer(latency=args.latency) as srv:
+        use_temp_db(tmp, "images")
+        urls = [
+            olx_monitor.offer_to_car(fake_olx.make_offer(n, base_url=srv.base_url))["image_url"]
+            for n in range(args.ads)
+        ]
+        pages = [urls[i:i + args.page_size] for i in range(0, len(urls), args.page_size)]
+        print(f"🧪 {args.ads} карток, сторінки по {args.page_size}, затримка CDN {args.latency * 1000:.0f} ms")
+
+        # Як раніше в ui.render_image: кожна картка - синхронний requests.get при кожному рендері
+        session = requests.Session()
+        wire = 0
+        started = time.perf_counter()
+        for page in pages:
+            for url in page:
+                wire += len(session.get(url, timeout=10).content)
+        legacy = time.perf_counter() - started
+
+        # Холодний кеш: промах віддає URL без очікування, мініатюри вантажаться у фоні
+        cache = image_cache.cache
+        started = time.perf_counter()
+        for page in pages:
+            [cache.lookup(url) for url in page]
+            cache.prefetch_async(page)
+        cold = time.perf_counter() - started
+        cache.wait()
+        fill = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for page in pages:
+                [cache.lookup(url) for url in page]
+        warm = (time.perf_counter() - started) / args.rounds
+        stored = sum(f.stat().st_size for f in cache.cache_dir.rglob("*.jpg"))
+
+        n = len(pages)
+        print(f"   без кешу:      {legacy / n * 1000:>8.1f} ms/сторінка, {wire / len(urls) / 1024:.1f} КБ/фото з CDN")
+        print(f"   холодний кеш:  {cold / n * 1000:>8.1f} ms/сторінка (фонове заповнення {fill:.2f} с)")
+        print(f"   теплий кеш:    {warm / n * 1000:>8.1f} ms/сторінка, {stored / len(urls) / 1024:.1f} КБ/мініатюра на диску")
+        print(f"   прискорення:   x{legacy / warm:.0f}, CDN-запитів за {args.rounds} теплих рендерів: 0")
+
+        # LRU: кеш у 4 рази менший за всі мініатюри
+        small = image_cache.ImageCache(Path(tmp) / "small", max_bytes=stored // 4)
+        small.prefetch(urls)
+        kept = sum(f.stat().st_size for f in small.cache_dir.rglob("*.jpg"))
+        print(f"   LRU до {stored // 4 / 1024:.0f} КБ: на диску {kept / 1024:.0f} КБ, витіснено {small.stats['evicted']}")
+
+
+# -----------------------------
+# 📦 split: важкі колонки в cars vs стиснута car_details
+# -----------------------------
+def bench_split(args):
+    listing = "SELECT {cols} FROM cars WHERE image_url IS NOT NULL ORDER BY created_at DESC LIMIT 300"
+    app_cols = "id, title, price_uah, image_url, ad_url, created_at, is_favorite"
+    ui_cols = "id, title, price_uah, image_url, ad_url, created_at, region_id"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = use_temp_db(tmp, "split")
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.init_db()
+            olx_monitor.save_cars_batch([olx_monitor.offer_to_car(fake_olx.make_offer(n)) for n in range(args.ads)])
+            olx_enricher.init_extended_db()
+        conn = database.connect(db_path, row_factory=None)
+        # Як писав збагачувач раніше: опис (до x`--desc-repeat`), параметри і фото прямо в cars
+        # (колонки, які міграція 17 прибрала)
+        database.add_columns(conn, "cars", {"description": "TEXT", "params": "TEXT", "all_photos": "TEXT"})
+        rows = []
+        for n in range(args.ads):
+            data = olx_enricher.ad_to_data(fake_olx.make_ad(n))
+            rows.append((data["description"] * args.desc_repeat, data["params"], data["all_photos"],
+                         str(900000000 + n)))
+        conn.executemany("UPDATE cars SET description = ?, params = ?, all_photos = ? WHERE id = ?", rows)
+        conn.commit()
+        print(f"🧪 {args.ads} оголошень, опис ~{sum(len(r[0]) for r in rows) / len(rows) / 1024:.1f} КБ")
+        print(f"   {'схема':<22} {'БД, МБ':>8} {'app (300), ms':>14} {'ui (усі), ms':>13}")
+
+        for label, app_q, ui_q in (
+            ("SELECT * (в cars)", listing.format(cols="*"), "SELECT * FROM cars"),
+            ("проекція + car_details", listing.format(cols=app_cols), f"SELECT {ui_cols} FROM cars"),
+        ):
+            if label.startswith("проекція"):
+                car_details.migrate_inline(conn)
+                for col in ("description", "params", "all_photos"):
+                    conn.execute(f"ALTER TABLE cars DROP COLUMN {col}")
+            conn.execute("VACUUM")
+            size = db_path.stat().st_size / 1024 / 1024
+            app_ms = statistics.median(timed(lambda: conn.execute(app_q).fetchall(), args.rounds)) * 1000
+            ui_ms = statistics.median(timed(lambda: conn.execute(ui_q).fetchall(), args.rounds)) * 1000
+            print(f"   {label:<22} {size:>8.1f} {app_ms:>14.1f} {ui_ms:>13.1f}")
+
+        raw = sum(len(r[0].encode()) + len(r[1].encode()) + len(r[2].encode()) for r in rows)
+        packed = conn.execute("SELECT SUM(LENGTH(data)) FROM car_details").fetchone()[0]
+        car_id = rows[0][3]
+        detail_ms = statistics.median(timed(lambda: car_details.load(conn, car_id), args.rounds * 20)) * 1000
+        print(f"   car_details: zlib x{raw / packed:.1f}, одна картка {detail_ms:.2f} ms")
+        conn.close()
+
+
+# -----------------------------
+# 📜 listing: LIMIT/OFFSET vs keyset-курсор на глибині прокрутки
+# -----------------------------
+def bench_listing(args):
+    import app  # Flask потрібен тільки цьому бенчмарку
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = use_temp_db(tmp, "listing")
+        app.DB_PATH = db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.init_db()
+            cars = [olx_monitor.offer_to_car(fake_olx.make_offer(n)) for n in range(args.ads)]
+            for i in range(0, len(cars), 500):
+                olx_monitor.save_cars_batch(cars[i:i + 500])
+        image_cache.cache.prefetch_async = lambda urls: None
+        print(f"🧪 {args.ads} оголошень, сторінка {app.PAGE_SIZE}")
+        print(f"   {'сторінка':>9} {'OFFSET, ms':>11} {'курсор, ms':>11}")
+
+        conn = database.get_connection(db_path)
+        where, _ = app.listing_filters({})
+        offset_q = f"""
+            SELECT {', '.join(app.LISTING_COLUMNS)} FROM cars WHERE {' AND '.join(where)}
+            ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+        """
+        with app.app.test_request_context():
+            cursor, page = None, 0
+            while page < args.depth:
+                started = time.perf_counter()
+                _, cursor = app.fetch_page({}, cursor)
+                keyset_ms = (time.perf_counter() - started) * 1000
+                page += 1
+                if page in args.report or not cursor:
+                    started = time.perf_counter()
+                    conn.execute(offset_q, (app.PAGE_SIZE, (page - 1) * app.PAGE_SIZE)).fetchall()
+                    offset_ms = (time.perf_counter() - started) * 1000
+                    print(f"   {page:>9} {offset_ms:>11.2f} {keyset_ms:>11.2f}")
+                if not cursor:
+                    break
+
+
+# -----------------------------
+# 📈 stats: середня/медіана проходом по cars vs готові агрегати price_stats
+# -----------------------------
+def bench_stats(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = use_temp_db(tmp, "stats")
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.init_db()
+            cars = [olx_monitor.offer_to_car(fake_olx.make_offer(n)) for n in range(args.ads)]
+            olx_monitor.INGEST_STATS.update(rows=0, new=0, batches=0, seconds=0.0)
+            for i in range(0, len(cars), 50):
+                olx_monitor.save_cars_batch(cars[i:i + 50])
+        conn = database.get_connection(db_path)
+        region_id = cars[0]["region_id"]
+        print(f"🧪 {args.ads} оголошень; запис з агрегатами {olx_monitor.ingest_throughput():.0f} rows/s")
+
+        def scan():
+            prices = [row[0] for row in conn.execute(
+                "SELECT price_uah FROM cars WHERE closed_at IS NULL AND price_uah > 0 AND region_id = ?", (region_id,)
+            )]
+            return statistics.mean(prices), statistics.median(prices)
+
+        exact_mean, exact_median = scan()
+        sketch = price_stats.summary(conn, region_id)
+        report("прохід по cars (область)", timed(scan, args.rounds))
+        report("price_stats.summary (область)", timed(lambda: price_stats.summary(conn, region_id), args.rounds))
+        print(f"   середня {exact_mean:,.0f} vs {sketch['mean']:,}; медіана {exact_median:,.0f} vs ≈{sketch['median']:,}"
+              f" ({(sketch['median'] / exact_median - 1) * 100:+.1f}%)")
+
+
+# -----------------------------
+# 🔎 search: pandas str.contains по датафрейму (як ui.py) vs FTS5 cars_fts
+# -----------------------------
+def bench_search(args):
+    import pandas as pd  # потрібен тільки цьому бенчмарку (і ui.py)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = use_temp_db(tmp, "search")
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.init_db()
+            cars = [olx_monitor.offer_to_car(fake_olx.make_offer(n)) for n in range(args.ads)]
+            for i in range(0, len(cars), 500):
+                olx_monitor.save_cars_batch(cars[i:i + 500])
+            olx_enricher.init_extended_db()
+        conn = database.get_connection(db_path)
+        details = [(str(900000000 + n), olx_enricher.ad_to_data(fake_olx.make_ad(n))) for n in range(args.ads)]
+        started = time.perf_counter()
+        with conn:
+            for car_id, data in details:
+                car_details.save(conn, car_id, data)
+        save_s = time.perf_counter() - started
+
+        # Що шукав би ui.py, якби тримав увесь текст у пам'яті: заголовок, місто, опис, параметри
+        df = pd.DataFrame({
+            "id": [car["id"] for car in cars],
+            "title": [car["title"] for car in cars],
+            "location": [f"{car['city_name'] or ''} {car['region_name'] or ''}" for car in cars],
+            "description": [car_details.full_text(data) for _, data in details],
+            "params": [search.flatten_params(data["params"]) for _, data in details],
+        })
+
+        def scan(q):
+            mask = pd.Series(True, index=df.index)
+            for word in search.TOKEN.findall(q):
+                mask &= (
+                    df["title"].str.contains(word, case=False, regex=False)
+                    | df["location"].str.contains(word, case=False, regex=False)
+                    | df["description"].str.contains(word, case=False, regex=False)
+                    | df["params"].str.contains(word, case=False, regex=False)
+                )
+            return df["id"][mask].tolist()
+
+        size = db_path.stat().st_size / 1024 / 1024
+        try:
+            fts = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'cars_fts%'").fetchone()[0]
+            size_note = f", з них cars_fts {fts / 1024 / 1024:.1f} МБ"
+        except sqlite3.OperationalError:
+            size_note = ""  # SQLite зібраний без dbstat
+        print(f"🧪 {args.ads} оголошень; car_details.save + індекс {args.ads / save_s:.0f} rows/s, "
+              f"БД {size:.1f} МБ{size_note}")
+        for q in args.queries:
+            pandas_hits, fts_hits = len(scan(q)), len(search.ranked(conn, q, limit=-1))
+            print(f"   «{q}»: {pandas_hits} vs {fts_hits} збігів")
+            report("pandas str.contains", timed(lambda: scan(q), args.rounds))
+            report("FTS5 bm25, усі збіги", timed(lambda: search.ranked(conn, q, limit=-1), args.rounds))
+            report("FTS5 bm25, топ-48", timed(lambda: search.ranked(conn, q, limit=48), args.rounds))
+
+
+# -----------------------------
+# 🗃️ cache: повторне оновлення дашборду - рендер vs кеш відповідей vs 304
+# -----------------------------
+def bench_cache(args):
+    import app  # Flask потрібен тільки цьому бенчмарку
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = use_temp_db(tmp, "cache")
+        app.DB_PATH = db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            olx_monitor.init_db()
+            cars = [olx_monitor.offer_to_car(fake_olx.make_offer(n)) for n in range(args.ads)]
+            for i in range(0, len(cars), 500):
+                olx_monitor.save_cars_batch(cars[i:i + 500])
+        image_cache.cache.prefetch_async = lambda urls: None
+        client = app.app.test_client()
+        print(f"🧪 {args.ads} оголошень, {len(args.urls)} адрес")
+
+        for url in args.urls:
+            first = client.get(url)
+            etag = first.headers["ETag"]
+            print(f"   {url} ({len(first.data) / 1024:.0f} КБ)")
+
+            def uncached():
+                app._response_cache.clear()
+                client.get(url)
+
+            report("рендер (кеш порожній)", timed(uncached, args.rounds))
+            report("кеш відповідей", timed(lambda: client.get(url), args.rounds))
+            report("304 (If-None-Match)", timed(lambda: client.get(url, headers={"If-None-Match": etag}), args.rounds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandit Cars benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("fetch", help="завантаження сторінок /api/v1/offers")
+    p.add_argument("--latency", type=float, default=0.3, help="затримка фейкового сервера, сек")
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_fetch)
+
+    p = sub.add_parser("ingest", help="запис оголошень у SQLite")
+    p.add_argument("--offers", type=int, default=100_000)
+    p.add_argument("--page-size", type=int, default=50)
+    p.add_argument("--baseline-sample", type=int, default=2000,
+                   help="скільки оголошень прогнати через старий save_car_and_verify")
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser("stopwords", help="фільтр стоп-слів по заголовках")
+    p.add_argument("--repeat", type=int, default=200)
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_stopwords)
+
+    p = sub.add_parser("e2e", help="монітор + збагачувач + Telegram на фейковому сервері")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    p.add_argument("--sample", type=int, default=500,
+                   help="скільки оголошень збагачувати і відправляти на кожному розмірі")
+    p.add_argument("--latency", type=float, default=0.05)
+    p.add_argument("--error-rate", type=float, default=0.01)
+    p.add_argument("--closed-rate", type=float, default=0.05)
+    p.add_argument("--pad-kb", type=int, default=300)
+    p.add_argument("--workers", type=int, default=3)
+    p.set_defaults(func=bench_e2e)
+
+    p = sub.add_parser("revisit", help="умовні (ETag/Last-Modified) і стиснені запити збагачувача")
+    p.add_argument("--ads", type=int, default=200)
+    p.add_argument("--pad-kb", type=int, default=300)
+    p.add_argument("--latency", type=float, default=0.0)
+    p.set_defaults(func=bench_revisit)
+
+    p = sub.add_parser("parse", help="витяг __PRERENDERED_STATE__ зі сторінки оголошення")
+    p.add_argument("--corpus", type=Path, help="каталог зі збереженими .html (fake_olx.py record -> ads/)")
+    p.add_argument("--pages", type=int, default=40, help="скільки синтетичних сторінок додати")
+    p.add_argument("--rounds", type=int, default=3)
+    p.set_defaults(func=bench_parse)
+
+    p = sub.add_parser("pool", help="пул воркерів збагачувача")
+    p.add_argument("--ads", type=int, default=300)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--pad-kb", type=int, default=300)
+    p.set_defaults(func=bench_pool)
+
+    p = sub.add_parser("source", help="збагачення через JSON API vs HTML")
+    p.add_argument("--ads", type=int, default=200)
+    p.add_argument("--pad-kb", type=int, default=300)
+    p.set_defaults(func=bench_source)
+
+    p = sub.add_parser("revisit-policy", help="симуляція адаптивних інтервалів перевірки")
+    p.add_argument("--ads", type=int, default=3000)
+    p.add_argument("--budget", type=int, default=300, help="запитів збагачувача на годину")
+    p.add_argument("--days", type=int, default=14)
+    p.add_argument("--hot-share", type=float, default=0.1)
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_revisit_policy)
+
+    p = sub.add_parser("stream", help="потокове читання сторінки оголошення з раннім обривом")
+    p.add_argument("--ads", type=int, default=100)
+    p.add_argument("--pad-kb", type=int, default=400)
+    p.add_argument("--head-share", type=float, default=0.1, help="яка частина сторінки стоїть до стану")
+    p.add_argument("--latency", type=float, default=0.0)
+    p.set_defaults(func=bench_stream)
+
+    p = sub.add_parser("images", help="сітка карток: фото з CDN vs локальний кеш мініатюр")
+    p.add_argument("--ads", type=int, default=240)
+    p.add_argument("--page-size", type=int, default=24)
+    p.add_argument("--latency", type=float, default=0.05, help="затримка CDN, сек")
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_images)
+
+    p = sub.add_parser("split", help="важкі текстові колонки в cars vs стиснута car_details")
+    p.add_argument("--ads", type=int, default=20_000)
+    p.add_argument("--desc-repeat", type=int, default=3, help="у скільки разів подовжити синтетичний опис")
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_split)
+
+    p = sub.add_parser("listing", help="/api/cars: OFFSET vs keyset-курсор на глибині")
+    p.add_argument("--ads", type=int, default=200_000)
+    p.add_argument("--depth", type=int, default=4000, help="скільки сторінок гортати")
+    p.add_argument("--report", type=int, nargs="+", default=[1, 10, 100, 1000, 4000])
+    p.set_defaults(func=bench_listing)
+
+    p = sub.add_parser("stats", help="цінова аналітика: прохід по cars vs price_stats")
+    p.add_argument("--ads", type=int, default=100_000)
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_stats)
+
+    p = sub.add_parser("search", help="пошук: pandas str.contains vs FTS5 cars_fts")
+    p.add_argument("--ads", type=int, default=100_000)
+    p.add_argument("--queries", nargs="+", default=["passat", "дизель", "львів octavia", "2015 бензин camry"])
+    p.add_argument("--rounds", type=int, default=5)
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("cache", help="Flask: рендер vs кеш відповідей vs 304 за ETag")
+    p.add_argument("--ads", type=int, default=20_000)
+    p.add_argument("--urls", nargs="+", default=["/", "/?region_id=25&q=passat", "/api/cars?limit=200"])
+    p.add_argument("--rounds", type=int, default=20)
+    p.set_defaults(func=bench_cache)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
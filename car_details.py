@@ -0,0 +1,105 @@
+import json
+import zlib
+
+import search
+
+
+# =============================
+# 📦 ВАЖКІ ПОЛЯ ОКРЕМО ВІД cars
+# =============================
+# description, full_description, params і all_photos - кілобайти на рядок, а сітка
+# в app/ui показує тільки заголовок, ціну, фото і дату. Тому вони лежать у car_details одним
+# zlib-стиснутим JSON і читаються лише для сторінки одного оголошення.
+# Біля blob-а - некомпресовані description_len і photo_count, щоб збагачувач
+# міг писати дельти в car_history, не розпаковуючи попередню версію.
+#
+# Старі колонки cars.description/full_description/params/all_photos заповнював колишній
+# "olx_enricher copy.py"; міграція 17 переносить звідти дані (migrate_inline) і видаляє
+# колонки. full_description - повний текст, description - прев'ю на 500 символів.
+# Текст опису і параметрів save() індексує в cars_fts (search.py) - без копії тексту.
+# Таблицю створює міграція 7 у database.py.
+
+DETAIL_FIELDS = ("description", "full_description", "params", "all_photos")
+ZLIB_LEVEL = 6
+
+
+def pack(fields: dict) -> bytes:
+    payload = json.dumps({key: fields.get(key) for key in DETAIL_FIELDS}, ensure_ascii=False)
+    return zlib.compress(payload.encode("utf-8"), ZLIB_LEVEL)
+
+
+def unpack(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def full_text(fields: dict) -> str:
+    """Повний опис; у blob-ах, записаних до full_description, повний текст лежить у description."""
+    return fields.get("full_description") or fields.get("description") or ""
+
+
+def description_len(fields: dict) -> int:
+    return len(full_text(fields))
+
+
+def photo_count(all_photos) -> int:
+    try:
+        return len(json.loads(all_photos or "[]"))
+    except ValueError:
+        return 0
+
+
+def search_texts(fields: dict) -> tuple:
+    """(повний опис, параметри одним рядком) - те, що з оголошення потрапляє в cars_fts."""
+    return full_text(fields), search.flatten_params(fields.get("params"))
+
+
+def search_text(blob, column: str) -> str:
+    """SQL-функція car_detail_text(data, 'description' | 'params') для тригерів cars_fts."""
+    if blob is None:
+        return ""
+    description, params = search_texts(unpack(blob))
+    return description if column == "description" else params
+
+
+def save(conn, car_id, fields: dict):
+    """Пише важкі поля оголошення (і їх текст у пошуковий індекс). Виклик всередині транзакції збагачувача."""
+    row = conn.execute("SELECT data FROM car_details WHERE car_id = ?", (car_id,)).fetchone()
+    old = search_texts(unpack(row[0])) if row else ("", "")
+    conn.execute(
+        "INSERT OR REPLACE INTO car_details (car_id, data, description_len, photo_count) VALUES (?, ?, ?, ?)",
+        (car_id, pack(fields), description_len(fields), photo_count(fields.get("all_photos"))),
+    )
+    search.reindex(conn, car_id, old, search_texts(fields))
+
+
+def load(conn, car_id) -> dict | None:
+    """description/full_description/params/all_photos одного оголошення або None, якщо його ще не збагачували."""
+    row = conn.execute("SELECT data FROM car_details WHERE car_id = ?", (car_id,)).fetchone()
+    return unpack(row[0]) if row else None
+
+
+def migrate_inline(conn, chunk: int = 500, commit: bool = True) -> int:
+    """Переносить заповнені cars.description/full_description/params/all_photos у car_details. Повертає кількість рядків."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(cars)")}
+    # full_description є тільки в базах, які створював старий збагачувач
+    inline = [col for col in DETAIL_FIELDS if col in existing]
+    if not inline:
+        return 0
+    moved = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, {', '.join(inline)} FROM cars
+            WHERE {' OR '.join(f'{col} IS NOT NULL' for col in inline)}
+            LIMIT ?
+        """, (chunk,)).fetchall()
+        if not rows:
+            return moved
+        for car_id, *values in rows:
+            save(conn, car_id, dict(zip(inline, values)))
+        conn.executemany(
+            f"UPDATE cars SET {', '.join(f'{col} = NULL' for col in inline)} WHERE id = ?",
+            [(row[0],) for row in rows],
+        )
+        if commit:
+            conn.commit()
+        moved += len(rows)
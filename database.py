@@ -0,0 +1,460 @@
+import sqlite3
+import threading
+import weakref
+from pathlib import Path
+
+import car_details
+import price_stats
+import search
+
+
+# =============================
+# 🗄️ СПІЛЬНИЙ ДОСТУП ДО cars.db
+# =============================
+# Монітор, збагачувач, нотифікатор, Flask і Streamlit - окремі процеси над однією базою.
+# Тут усе, що їх стосується разом:
+#   - схема: пронумеровані міграції, застосовані версії - у PRAGMA user_version;
+#   - WAL + busy_timeout: читачі не блокують письменника і навпаки, а два письменники
+#     чекають один на одного замість "database is locked";
+#   - з'єднання: одне на потік і базу, живе, поки живе потік, тож довгі цикли процесів
+#     тримають підготовлені запити в кеші (cached_statements); короткі потоки (запит Flask)
+#     закривають своє close_connection(), а з'єднання завершених потоків закриваються самі.
+#
+# ⚠️ Писати в cars і car_details - тільки через connect() / get_connection(). Тригери cars_fts
+# (міграція 14) викликають car_detail_text() - Python-функцію, яку реєструє connect().
+# Голий sqlite3.connect() (або sqlite3 CLI) на INSERT/UPDATE/DELETE cars впаде з
+# "no such function: car_detail_text". Читати можна будь-яким з'єднанням.
+
+BASE_DIR = Path(__file__).parent.resolve()
+DB_PATH = BASE_DIR / "cars.db"
+
+PRAGMAS = {
+    "busy_timeout": 30_000,      # мс очікування чужого запису
+    "synchronous": "NORMAL",     # у WAL достатньо: коміт переживе падіння процесу
+    "temp_store": "MEMORY",
+    "cache_size": -16_000,       # ~16 МБ сторінок на з'єднання
+    "mmap_size": 64 * 1024 * 1024,
+}
+STATEMENT_CACHE = 256
+
+
+
+class _ThreadConnections:
+    """З'єднання одного потоку {шлях бази: з'єднання}; окремий об'єкт, щоб реєстр тримав його за weakref."""
+
+    def __init__(self):
+        self.by_path = {}
+
+
+_local = threading.local()
+# Реєстр для close_all() - слабкий: коли потік завершується, threading.local відпускає його
+# _ThreadConnections, і з'єднання закриваються разом з ним, а не накопичуються до close_all().
+_all_connections = weakref.WeakSet()
+_registry_lock = threading.Lock()
+_migrated = set()
+
+
+def connect(db_path: Path = None, row_factory=sqlite3.Row, **kwargs) -> sqlite3.Connection:
+    """
+    Нове з'єднання з прагмами. Для коротких скриптів; процеси беруть get_connection().
+    Реєструє car_detail_text(), без якої тригери cars_fts не дають писати в cars.
+    """
+    conn = sqlite3.connect(
+        db_path or DB_PATH, timeout=PRAGMAS["busy_timeout"] / 1000,
+        cached_statements=STATEMENT_CACHE, **kwargs,
+    )
+    conn.row_factory = row_factory
+    # потрібна тригерам cars_fts (міграція 14): текст опису/параметрів зі стиснутого car_details
+    conn.create_function("car_detail_text", 2, car_details.search_text, deterministic=True)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_connection(db_path: Path = None) -> sqlite3.Connection:
+    """З'єднання цього потоку з базою; не закривати - його використає наступний виклик."""
+    key = str(db_path or DB_PATH)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = _ThreadConnections()
+        with _registry_lock:
+            _all_connections.add(connections)
+    conn = connections.by_path.get(key)
+    if conn is None:
+        conn = connections.by_path[key] = connect(key)
+    return conn
+
+
+def close_connection(db_path: Path = None):
+    """Закриває з'єднання цього потоку (кінець запиту Flask); наступний get_connection() відкриє нове."""
+    connections = getattr(_local, "connections", None)
+    conn = connections.by_path.pop(str(db_path or DB_PATH), None) if connections is not None else None
+    if conn is not None:
+        conn.close()
+
+
+def close_all():
+    """Закриває всі видані get_connection() з'єднання (бенчмарки між тимчасовими базами)."""
+    with _registry_lock:
+        holders = list(_all_connections)
+        _all_connections.clear()
+        _migrated.clear()
+    for connections in holders:
+        for conn in list(connections.by_path.values()):
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # з'єднання іншого потоку
+        connections.by_path.clear()
+    _local.__dict__.pop("connections", None)
+
+
+# =============================
+# 🧱 МІГРАЦІЇ
+# =============================
+def columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def add_columns(conn, table: str, new_columns: dict):
+    existing = columns(conn, table)
+    for col, col_type in new_columns.items():
+        if col not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
+
+
+def _cars(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cars (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            price_value INTEGER,
+            price_currency TEXT,
+            price_uah INTEGER,
+            price_raw TEXT,
+            location_raw TEXT,
+            image_url TEXT,
+            ad_url TEXT,
+            created_at TEXT
+        )
+    """)
+
+
+def _typed_location(conn):
+    # Типізовані колонки замість repr-рядків location_raw / price_raw
+    add_columns(conn, "cars", {
+        "city_id": "INTEGER",
+        "city_name": "TEXT",
+        "district_id": "INTEGER",
+        "region_id": "INTEGER",
+        "region_name": "TEXT",
+        "negotiable": "INTEGER",
+        "trade": "INTEGER",
+    })
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_region_id ON cars (region_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_city_id ON cars (city_id)")
+
+
+def _monitor_state(conn):
+    # Стан монітора між перезапусками (high-water mark тощо)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS monitor_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _enricher(conn):
+    # description/params/all_photos тут - історичні inline-колонки; дані в car_details,
+    # а самі колонки прибирає міграція 17
+    add_columns(conn, "cars", {
+        "description": "TEXT",
+        "params": "TEXT",
+        "seller_name": "TEXT",
+        "all_photos": "TEXT",
+        "is_active": "INTEGER",
+        "last_full_check": "TEXT",
+        "is_favorite": "INTEGER DEFAULT 0",
+        "etag": "TEXT",
+        "last_modified": "TEXT",
+        "content_hash": "TEXT",
+    })
+    # Історія змін: тільки дельти (ціна, статус, довжина опису, кількість фото), без повних копій
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS car_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            car_id TEXT NOT NULL,
+            changed_at TEXT NOT NULL,
+            price_value INTEGER,
+            is_active INTEGER,
+            description_len INTEGER,
+            photo_count INTEGER
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_car_history_car ON car_history (car_id, changed_at)")
+
+
+def _enrich_queue(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS enrich_queue (
+            car_id TEXT PRIMARY KEY,
+            priority INTEGER NOT NULL,
+            next_check_at REAL NOT NULL,
+            interval REAL
+        )
+    """)
+    add_columns(conn, "enrich_queue", {"interval": "REAL"})
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_enrich_queue_due ON enrich_queue (priority, next_check_at, car_id)"
+    )
+
+
+def _tombstones(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tombstones (
+            id TEXT PRIMARY KEY,
+            closed_at TEXT NOT NULL,
+            reason TEXT
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tombstones_closed_at ON tombstones (closed_at)")
+    add_columns(conn, "cars", {"closed_at": "TEXT"})
+    # Частковий індекс: UI фільтрує closed_at IS NULL, закриті рядки в індекс не потрапляють
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_open_created ON cars (created_at) WHERE closed_at IS NULL")
+
+
+def _car_details(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS car_details (
+            car_id TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            description_len INTEGER,
+            photo_count INTEGER
+        )
+    """)
+
+
+def _telegram(conn):
+    add_columns(conn, "cars", {"sent_to_tg": "INTEGER DEFAULT 0"})
+    conn.execute("UPDATE cars SET sent_to_tg = 0 WHERE sent_to_tg IS NULL")
+
+
+def _listing_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_created_at ON cars (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_price_uah ON cars (price_uah)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_last_full_check ON cars (last_full_check)")
+    # Вибраних і невідправлених - одиниці, часткові індекси тримають тільки їх
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_favorite ON cars (created_at) WHERE is_favorite = 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_unsent ON cars (sent_to_tg) WHERE sent_to_tg = 0")
+
+
+def _keyset_indexes(conn):
+    # app /api/cars гортає за (created_at, id): id в індексі - і для порядку, і для курсора
+    conn.execute("DROP INDEX IF EXISTS idx_cars_open_created")
+    conn.execute("DROP INDEX IF EXISTS idx_cars_favorite")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_open_listing ON cars (created_at, id) WHERE closed_at IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cars_favorite ON cars (created_at, id) WHERE is_favorite = 1")
+
+
+def _price_stats(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_stats (
+            day TEXT NOT NULL,
+            region_id INTEGER NOT NULL,
+            make TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            hist TEXT NOT NULL,
+            PRIMARY KEY (day, region_id, make)
+        ) WITHOUT ROWID
+    """)
+    price_stats.rebuild(conn)
+
+
+def _price_stats_rebuild(conn):
+    # backfill_typed_columns.py до виправлення лишав агрегати під UNKNOWN_REGION
+    price_stats.rebuild(conn)
+
+
+def _enrich_queue_errors(conn):
+    # Помилок перевірки поспіль - для backoff у enrich_queue.reschedule_error
+    add_columns(conn, "enrich_queue", {"errors": "INTEGER NOT NULL DEFAULT 0"})
+
+
+def _drop_inline_details(conn):
+    # Inline-колонки деталей більше ніхто не пише ("olx_enricher copy.py" видалено):
+    # переносимо залишки в car_details і прибираємо колонки
+    car_details.migrate_inline(conn, commit=False)
+    existing = columns(conn, "cars")
+    for col in car_details.DETAIL_FIELDS:
+        if col in existing:
+            conn.execute(f"ALTER TABLE cars DROP COLUMN {col}")
+
+
+def _search(conn):
+    # Повнотекстовий індекс (search.py). Тригери - тільки вбудовані функції SQL: cars пишуть
+    # і процеси, що не відкривають базу через database.connect ("olx_enricher copy.py").
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS cars_fts USING fts5 (
+            title, location, description, params,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS cars_fts_insert AFTER INSERT ON cars BEGIN
+            INSERT INTO cars_fts (rowid, title, location, description, params)
+            VALUES (new.rowid, new.title,
+                    trim(coalesce(new.city_name, '') || ' ' || coalesce(new.region_name, '')), '', '');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS cars_fts_update AFTER UPDATE OF title, city_name, region_name ON cars BEGIN
+            UPDATE cars_fts
+            SET title = new.title,
+                location = trim(coalesce(new.city_name, '') || ' ' || coalesce(new.region_name, ''))
+            WHERE rowid = new.rowid;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS cars_fts_delete AFTER DELETE ON cars BEGIN
+            DELETE FROM cars_fts WHERE rowid = old.rowid;
+        END
+    """)
+    # Наповнення, яке тут було (search.rebuild + car_details.reindex_search), перенесене в
+    # міграцію 14: вона одразу замінює цю таблицю, тож індекс будується один раз.
+
+
+def _search_contentless(conn):
+    # Перша версія cars_fts (12) зберігала власну нестиснуту копію опису і параметрів.
+    # content='' - FTS5 тримає тільки індекс: опис і так лежить стиснутим у car_details.
+    # Ціна - видалення документа вимагає старого тексту; тригери беруть його з car_details
+    # через car_detail_text(), яку реєструє connect(). Див. ⚠️ у заголовку модуля.
+    for trigger in ("cars_fts_insert", "cars_fts_update", "cars_fts_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS cars_fts")
+    conn.execute("""
+        CREATE VIRTUAL TABLE cars_fts USING fts5 (
+            title, location, description, params,
+            content = '',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    details = "(SELECT data FROM car_details WHERE car_id = {row}.id)"
+    old_doc = f"""
+        INSERT INTO cars_fts (cars_fts, rowid, title, location, description, params)
+        VALUES ('delete', old.rowid, old.title, {search.location_sql('old.')},
+                car_detail_text({details.format(row='old')}, 'description'),
+                car_detail_text({details.format(row='old')}, 'params'));
+    """
+    new_doc = f"""
+        INSERT INTO cars_fts (rowid, title, location, description, params)
+        VALUES (new.rowid, new.title, {search.location_sql('new.')},
+                car_detail_text({details.format(row='new')}, 'description'),
+                car_detail_text({details.format(row='new')}, 'params'));
+    """
+    for trigger, event, body in (
+        ("cars_fts_insert", "INSERT ON cars", new_doc),
+        ("cars_fts_update", "UPDATE OF id, title, city_name, region_name ON cars", old_doc + new_doc),
+        ("cars_fts_delete", "DELETE ON cars", old_doc),
+    ):
+        conn.execute(f"CREATE TRIGGER {trigger} AFTER {event} BEGIN {body} END")
+    search.rebuild(conn)
+
+
+def _change_counter(conn):
+    # Лічильник змін того, що показує фронтенд (app.py: кеш відповідей, ETag/Last-Modified).
+    # PRAGMA data_version не підходить: він свій у кожного з'єднання і не бачить власних записів.
+    # Тригери бачать усіх письменників, і тільки колонки списку: last_full_check, etag тощо
+    # збагачувач оновлює постійно, а на сторінці вони не видні.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_counter (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("INSERT OR IGNORE INTO change_counter VALUES ('listing', 0, CAST(strftime('%s', 'now') AS INTEGER))")
+    bump = """
+        UPDATE change_counter SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE name = 'listing';
+    """
+    for trigger, event in (
+        ("cars_changed_insert", "INSERT ON cars"),
+        ("cars_changed_delete", "DELETE ON cars"),
+        ("cars_changed_update", "UPDATE OF title, price_uah, image_url, ad_url, created_at, is_favorite, "
+                                "closed_at, region_id, region_name, city_name ON cars"),
+        ("car_details_changed_insert", "INSERT ON car_details"),
+        ("car_details_changed_update", "UPDATE ON car_details"),
+    ):
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} BEGIN {bump} END")
+
+
+# (версія, назва, функція). Нова зміна схеми - новий рядок у кінці, старі не редагуються.
+MIGRATIONS = (
+    (1, "cars", _cars),
+    (2, "typed location columns", _typed_location),
+    (3, "monitor_state", _monitor_state),
+    (4, "enricher columns + car_history", _enricher),
+    (5, "enrich_queue", _enrich_queue),
+    (6, "tombstones + cars.closed_at", _tombstones),
+    (7, "car_details", _car_details),
+    (8, "cars.sent_to_tg", _telegram),
+    (9, "listing indexes", _listing_indexes),
+    (10, "keyset listing indexes", _keyset_indexes),
+    (11, "price_stats", _price_stats),
+    (12, "cars_fts full-text search", _search),
+    (13, "change_counter", _change_counter),
+    (14, "contentless cars_fts", _search_contentless),
+    (15, "price_stats rebuild after typed backfill", _price_stats_rebuild),
+    (16, "enrich_queue.errors", _enrich_queue_errors),
+    (17, "drop inline detail columns", _drop_inline_details),
+)
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> list:
+    """
+    Застосовує міграції, новіші за user_version. Кожна - своя транзакція IMMEDIATE,
+    тож два процеси, що стартують одночасно, не застосують одну міграцію двічі.
+    Повертає назви застосованих.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")  # зберігається у файлі бази
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        if schema_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) < version:  # інший процес міг встигнути, поки ми чекали
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied.append(name)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    if applied:
+        print(f"🧱 Міграції БД: {', '.join(applied)} (версія {schema_version(conn)})")
+    return applied
+
+
+def init(db_path: Path = None) -> sqlite3.Connection:
+    """Мігрує базу (раз на процес) і повертає з'єднання цього потоку."""
+    conn = get_connection(db_path)
+    key = str(db_path or DB_PATH)
+    if key not in _migrated:
+        migrate(conn)
+        _migrated.add(key)
+    return conn
+
+
+def change_counter(conn, name: str = "listing") -> tuple:
+    """(версія, unix-час останньої зміни); версія росте з кожним записом, що змінює сторінку."""
+    row = conn.execute("SELECT version, changed_at FROM change_counter WHERE name = ?", (name,)).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
@@ -0,0 +1,189 @@
+import time
+from datetime import datetime
+
+
+# =============================
+# 📬 ЧЕРГА ЗБАГАЧЕННЯ
+# =============================
+# Замість трьох SELECT ... ORDER BY по всій таблиці cars кожного циклу збагачувач
+# читає чергу: (priority, next_check_at) під покриваючим індексом, тож наступна
+# порція - це діапазонне читання індексу, а не сортування всієї таблиці.
+# next_check_at - unix-час (REAL), а не ISO-рядок, який порівнювався лексично.
+# Таблицю і індекс створює міграція database.py.
+#
+# Чергу ведуть всі, хто змінює стан оголошення:
+#   olx_monitor.save_cars_batch  -> enqueue_new
+#   app.toggle_favorite          -> set_favorite
+#   olx_enricher.save_results    -> reschedule / reschedule_error / remove
+#
+# ⏳ Адаптивні інтервали: кожна перевірка без змін множить інтервал оголошення на growth,
+# зміна ціни чи статусу стискає його на shrink. Стеля залежить від віку оголошення
+# (свіжі змінюються частіше) і цінового діапазону (дешеві продаються швидше).
+# Стеля - це і компроміс: довгий інтервал економить запити на зміні ціни, але закриття
+# оголошення виявляється в середньому через половину інтервалу. benchmark.py revisit-policy
+# (3000 оголошень, 14 днів): зі стелею 7 днів adaptive виявляв закриття за 20.2 год проти
+# 15.4 год у round-robin з тими ж витратами. Зі стелею 36 год - 12.1 проти 12.0 год,
+# зміни ціни вдвічі швидше (5.7 проти 12.0 год), а запитів на 63% менше, ніж round-robin
+# на повному бюджеті. Довша стеля - менше запитів ціною пізніше виявлених закриттів.
+#
+# ⚠️ Перевірка, що впала (мережа, парсинг), не мовчить: reschedule_error відкладає оголошення
+# на error_backoff, подвоюючи затримку з кожною помилкою поспіль (до max_error_backoff).
+# Успішна перевірка скидає лічильник errors.
+
+FAVORITE = 0  # вибрані: кожні favorite_interval
+NEW = 1       # ще без опису: якнайшвидше
+STALE = 2     # звичайне коло перевірки
+
+QUEUE_CONFIG = {
+    "favorite_interval": 15 * 60,   # сек, як olx_enricher.FAVORITE_CHECK_INTERVAL
+    "min_interval": 3600,           # перший і найкоротший інтервал звичайного оголошення
+    "growth": 2.0,                  # x інтервал після перевірки без змін
+    "shrink": 0.25,                 # x інтервал після зміни ціни/статусу
+    "error_backoff": 5 * 60,        # сек, відкладення після першої помилки поспіль
+    "max_error_backoff": 6 * 3600,  # сек, найдовше відкладення після помилок
+    # (вік оголошення до, сек) -> найдовший інтервал, сек
+    "age_caps": (
+        (86400, 6 * 3600),
+        (7 * 86400, 86400),
+        (None, 36 * 3600),  # довше - закриття помітні пізніше, ніж у round-robin (див. вище)
+    ),
+    # (ціна до, грн) -> множник стелі
+    "price_factors": (
+        (300_000, 0.5),
+        (1_500_000, 1.0),
+        (None, 1.5),
+    ),
+}
+
+
+def parse_check_time(value) -> float:
+    """ISO-рядок (last_full_check, created_at) -> unix-час; 0 якщо порожньо."""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def backfill(conn):
+    """Ставить у чергу оголошення, яких там ще немає (існуючі бази, старі процеси без черги)."""
+    # закриті (tombstones) не повертаємо
+    rows = conn.execute("SELECT id, is_favorite, is_active, last_full_check FROM cars WHERE closed_at IS NULL")
+    entries = []
+    for car_id, is_favorite, is_active, last_full_check in rows:
+        checked = parse_check_time(last_full_check)
+        if is_favorite:
+            entries.append((car_id, FAVORITE, checked + QUEUE_CONFIG["favorite_interval"] if checked else 0.0))
+        elif is_active is None:  # is_active ставить тільки успішне збагачення
+            entries.append((car_id, NEW, 0.0))
+        else:
+            entries.append((car_id, STALE, checked + QUEUE_CONFIG["min_interval"] if checked else 0.0))
+    conn.executemany(
+        "INSERT OR IGNORE INTO enrich_queue (car_id, priority, next_check_at) VALUES (?, ?, ?)", entries
+    )
+    conn.commit()
+
+
+def enqueue_new(conn, car_ids):
+    """Нові оголошення від монітора: перевірити якнайшвидше. Виклик всередині транзакції вставки."""
+    now = time.time()
+    conn.executemany(
+        "INSERT OR IGNORE INTO enrich_queue (car_id, priority, next_check_at) VALUES (?, ?, ?)",
+        [(car_id, NEW, now) for car_id in car_ids],
+    )
+
+
+def set_favorite(conn, car_id, is_favorite: bool):
+    """Додали у вибране - перевірити одразу; прибрали - повернути у звичайне коло."""
+    now = time.time()
+    if is_favorite:
+        priority, next_check_at = FAVORITE, now
+    else:
+        priority, next_check_at = STALE, now + QUEUE_CONFIG["min_interval"]
+    # Не REPLACE: той видаляє рядок і скидає вивчений interval
+    conn.execute("""
+        INSERT INTO enrich_queue (car_id, priority, next_check_at) VALUES (?, ?, ?)
+        ON CONFLICT(car_id) DO UPDATE SET priority = excluded.priority, next_check_at = excluded.next_check_at
+    """, (car_id, priority, next_check_at))
+
+
+def interval_cap(created_at, price_uah, now: float = None) -> float:
+    """Найдовший інтервал для оголошення цього віку (created_at - ISO-рядок) і ціни."""
+    now = now or time.time()
+    return age_cap(now - (parse_check_time(created_at) or now), price_uah)
+
+
+def age_cap(age: float, price_uah) -> float:
+    cap = next(limit for until, limit in QUEUE_CONFIG["age_caps"] if until is None or age < until)
+    if price_uah:
+        cap *= next(factor for until, factor in QUEUE_CONFIG["price_factors"] if until is None or price_uah < until)
+    return max(QUEUE_CONFIG["min_interval"], cap)
+
+
+def next_interval(interval, changed, cap: float) -> float:
+    """
+    changed=False - ширше (до cap), True - вужче (до min_interval),
+    None - перевірка нічого не сказала (не розібрали сторінку), інтервал той самий.
+    """
+    interval = interval or QUEUE_CONFIG["min_interval"]
+    if changed is not None:
+        interval *= QUEUE_CONFIG["shrink"] if changed else QUEUE_CONFIG["growth"]
+    return min(cap, max(QUEUE_CONFIG["min_interval"], interval))
+
+
+def reschedule(conn, car_id, is_favorite: bool, changed: bool = None,
+               created_at: str = None, price_uah: int = None, checked_at: float = None) -> float:
+    """Після перевірки: наступна через favorite_interval або адаптивний інтервал. Повертає інтервал."""
+    checked_at = checked_at or time.time()
+    row = conn.execute("SELECT interval FROM enrich_queue WHERE car_id = ?", (car_id,)).fetchone()
+    interval = next_interval(row[0] if row else None, changed, interval_cap(created_at, price_uah, checked_at))
+    if is_favorite:
+        priority, next_check_at = FAVORITE, checked_at + QUEUE_CONFIG["favorite_interval"]
+    else:
+        priority, next_check_at = STALE, checked_at + interval
+    conn.execute(
+        "INSERT OR REPLACE INTO enrich_queue (car_id, priority, next_check_at, interval, errors) VALUES (?, ?, ?, ?, 0)",
+        (car_id, priority, next_check_at, interval),
+    )
+    return interval
+
+
+def reschedule_error(conn, car_id, failed_at: float = None) -> float:
+    """Перевірка впала: наступна спроба через error_backoff * 2^(помилок поспіль - 1). Повертає затримку."""
+    failed_at = failed_at or time.time()
+    row = conn.execute("SELECT errors FROM enrich_queue WHERE car_id = ?", (car_id,)).fetchone()
+    if row is None:  # вже не в черзі (закрите)
+        return 0.0
+    errors = (row[0] or 0) + 1
+    delay = min(QUEUE_CONFIG["max_error_backoff"], QUEUE_CONFIG["error_backoff"] * 2 ** (errors - 1))
+    conn.execute(
+        "UPDATE enrich_queue SET errors = ?, next_check_at = ? WHERE car_id = ?",
+        (errors, failed_at + delay, car_id),
+    )
+    return delay
+
+
+def remove(conn, car_id):
+    conn.execute("DELETE FROM enrich_queue WHERE car_id = ?", (car_id,))
+
+
+def next_batch(conn, limit: int, now: float = None) -> list:
+    """
+    До `limit` оголошень, яким настав час, за пріоритетом (вибрані, нові, старі).
+    Кожен пріоритет - окремий діапазон індексу idx_enrich_queue_due.
+    """
+    now = now or time.time()
+    rows = []
+    for priority in (FAVORITE, NEW, STALE):
+        if len(rows) >= limit:
+            break
+        rows += conn.execute("""
+            SELECT c.id, c.ad_url, c.title, c.is_favorite, c.etag, c.last_modified, q.priority
+            FROM enrich_queue q INDEXED BY idx_enrich_queue_due
+            JOIN cars c ON c.id = q.car_id
+            WHERE q.priority = ? AND q.next_check_at <= ?
+            ORDER BY q.next_check_at
+            LIMIT ?
+        """, (priority, now, limit - len(rows))).fetchall()
+    return rows
@@ -0,0 +1,437 @@
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone, timedelta
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+
+# =============================
+# 🧪 ЛОКАЛЬНИЙ ФЕЙКОВИЙ OLX
+# =============================
+# Підміняє всі зовнішні сервіси, щоб монітор, збагачувач і нотифікатор працювали офлайн:
+#   /api/v1/offers               - сторінки оголошень (синтетичні або записані)
+#   /api/v1/offers/<id>/         - одне оголошення (JSON-шлях збагачувача)
+#   /d/uk/obyavlenie/...html     - сторінки оголошень з window.__PRERENDERED_STATE__
+#   /v1/files/<id>/image;s=WxH   - фото оголошень (CDN), розмір тіла залежить від WxH
+#   /bot<token>/sendPhoto|...    - Telegram Bot API
+#
+#   python fake_olx.py serve [--latency 0.3] [--error-rate 0.05] [--replay fixtures/]
+#   python fake_olx.py record fixtures/ [--pages 3] [--ads 20]
+
+OLX_BASE = "https://www.olx.ua"
+
+TITLES = [
+    "Volkswagen Passat B7", "Toyota Camry 2.5", "BMW 520d F10", "Skoda Octavia A7",
+    "Renault Megane 3", "Audi A6 C7", "Ford Focus 3", "Honda Accord 9",
+    "Mazda 6 GJ", "Nissan Leaf 30 kWh", "Hyundai Tucson", "Kia Sportage",
+]
+REGIONS = [
+    (25, "Київська область", "ko", 268, "Київ"),
+    (24, "Вінницька область", "vin", 689, "Крижопіль"),
+    (5, "Львівська область", "lv", 130, "Львів"),
+    (6, "Одеська область", "od", 312, "Одеса"),
+]
+OFFER_PATH = re.compile(r"^/api/v1/offers/(\d+)/?$")
+# Блоки по ~1 КБ розмітки, що стискаються приблизно як справжня сторінка (а не "xxxx" у 200 разів).
+# 64 різні блоки - більше за вікно gzip (32 КБ), щоб повтори не стискались у нуль.
+_words = random.Random(0)
+FILLERS = [
+    "<div class=\"css-filler\">" + " ".join(
+        _words.choice(["olx", "auto", "card", "price", "grid", "flex", "item", "span", "img", "link",
+                       "Київ", "доставка", "продаж", "пробіг", "стан"]) + str(_words.randint(0, 999))
+        for _ in range(110)
+    )[:1000] + "</div>\n"
+    for _ in range(64)
+]
+
+AD_PATH = re.compile(r"^/d/uk/obyavlenie/.*-ID(\d+)\.html$")
+IMAGE_PATH = re.compile(r"^/v1/files/([^/;]+)/image(?:;s=(\d+)x(\d+))?$")
+OLX_CDN = "https://ireland.apollo.olxcdn.com:443"
+TELEGRAM_PATH = re.compile(r"^/bot[^/]+/(sendPhoto|sendMessage)$")
+
+
+def ad_url(n: int, base_url: str = OLX_BASE) -> str:
+    return f"{base_url}/d/uk/obyavlenie/fake-car-ID{n:07d}.html"
+
+
+def make_offer(n: int, now: datetime = None, base_url: str = OLX_BASE) -> dict:
+    """Синтетичне оголошення у форматі відповіді /api/v1/offers."""
+    now = now or datetime.now(timezone.utc)
+    rnd = random.Random(n)
+    cdn = OLX_CDN if base_url == OLX_BASE else base_url
+    region_id, region_name, region_norm, city_id, city_name = rnd.choice(REGIONS)
+    title = f"{rnd.choice(TITLES)} {2005 + n % 19}"
+    usd = rnd.randint(2000, 40000)
+    return {
+        "id": 900000000 + n,
+        "url": ad_url(n, base_url),
+        "title": title,
+        "created_time": (now - timedelta(minutes=n)).isoformat(),
+        "last_refresh_time": (now - timedelta(minutes=n)).isoformat(),
+        "params": [
+            {"key": "price", "name": "Ціна", "type": "price", "value": {
+                "value": usd, "currency": "USD", "negotiable": bool(n % 3 == 0),
+                "trade": False, "budget": False, "converted_value": usd * 41,
+                "converted_currency": "UAH", "label": f"{usd} $",
+            }},
+        ],
+        "location": {
+            "city": {"id": city_id, "name": city_name, "normalized_name": city_name.lower()},
+            "region": {"id": region_id, "name": region_name, "normalized_name": region_norm},
+        },
+        "photos": [
+            {"id": n * 10 + i, "link": f"{cdn}/v1/files/fake{n}-{i}-UA/image;s={{width}}x{{height}}"}
+            for i in range(1 + n % 8)
+        ],
+    }
+
+
+def make_ad(n: int, status: str = "active") -> dict:
+    """Оголошення в тому вигляді, як воно лежить у __PRERENDERED_STATE__ -> ad -> ad."""
+    offer = make_offer(n)
+    rnd = random.Random(n)
+    description = " ".join(
+        f"{offer['title']} у гарному стані, пробіг {rnd.randint(50, 300)} тис. км." for _ in range(1 + n % 12)
+    )
+    return {
+        "id": offer["id"],
+        "title": offer["title"],
+        "status": status,
+        "description": description,
+        "user": {"id": 1000 + n % 97, "name": f"Продавець {n % 97}"},
+        "params": [
+            {"key": "model", "name": "Модель", "value": {"key": "m", "label": offer["title"].split()[1]}},
+            {"key": "motor_year", "name": "Рік випуску", "value": {"key": "y", "label": str(2005 + n % 19)}},
+            {"key": "fuel_type", "name": "Вид палива", "value": {"key": "f", "label": rnd.choice(["Бензин", "Дизель", "Газ/бензин"])}},
+        ],
+        "photos": offer["photos"],
+        "price": {"regularPrice": {"value": offer["params"][0]["value"]["value"], "currencyCode": "USD"}},
+    }
+
+
+def render_ad_page(ad: dict, pad_kb: int = 300, state_form: str = "object", head_share: float = 0.5) -> str:
+    """
+    HTML сторінки оголошення розміром ~pad_kb КБ; head_share - яка частина розмітки стоїть до стану.
+    state_form="object" - window.__PRERENDERED_STATE__= {...};
+    state_form="string" - window.__PRERENDERED_STATE__= "{\\"ad\\":...}"; (екранований рядок)
+    """
+    state = json.dumps({"ad": {"ad": ad}, "page": {"name": "ad"}}, ensure_ascii=False)
+    if state_form == "string":
+        state = json.dumps(state, ensure_ascii=False)
+    head_blocks = max(0, round(pad_kb * head_share))
+    head = "".join(FILLERS[i % len(FILLERS)] for i in range(head_blocks))
+    tail = "".join(FILLERS[i % len(FILLERS)] for i in range(head_blocks, max(head_blocks, pad_kb)))
+    return (
+        "<!DOCTYPE html><html lang=\"uk\"><head><meta charset=\"utf-8\">"
+        f"<title>{ad['title']}</title></head><body>\n{head}"
+        f"<script>window.__PRERENDERED_STATE__= {state};</script>\n"
+        f"<div data-cy=\"ad_description\"><div>{ad['description']}</div></div>\n{tail}</body></html>"
+    )
+
+
+class FakeOLXHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, як у справжнього сервера
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass  # клієнт закрив з'єднання посеред тіла (потокове читання збагачувача)
+
+    def _send(self, body: bytes, content_type: str, status: int = 200, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status == 304:
+            self.end_headers()
+            return
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(body, "application/json; charset=utf-8", status, headers)
+
+    def _inject(self) -> bool:
+        """Затримка і штучні помилки. True - відповідь вже відправлена."""
+        server = self.server
+        if server.latency or server.jitter:
+            time.sleep(server.latency + server.roll() * server.jitter)
+        roll = server.roll()
+        if roll < server.throttle_rate:
+            server.count("throttled")
+            self._send_json({"error": "too many requests"}, 429, {"Retry-After": "1"})
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            server.count("errors")
+            self._send_json({"error": "internal"}, 500)
+            return True
+        return False
+
+    def do_GET(self):
+        if self._inject():
+            return
+        server = self.server
+        url = urlparse(self.path)
+
+        if url.path.rstrip("/") == "/api/v1/offers":
+            query = parse_qs(url.query)
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["50"])[0])
+            server.count("offers")
+            self._send_json(server.offers_page(offset, limit))
+            return
+
+        match = OFFER_PATH.match(url.path)
+        if match:
+            server.count("offer_api")
+            detail = server.offer_detail(int(match.group(1)))
+            if detail is None:
+                self._send_json({"error": {"status": 404, "title": "Not Found"}}, 404)
+            else:
+                self._send_json(detail)
+            return
+
+        match = AD_PATH.match(url.path)
+        if match:
+            server.count("ads")
+            html = server.ad_page(url.path, int(match.group(1)))
+            if html is None:
+                self._send_json({"error": "not found"}, 404)
+                return
+            body = html.encode("utf-8")
+            validators = {
+                "ETag": f'"{zlib.crc32(body):08x}"',
+                "Last-Modified": format_datetime(server.started_at, usegmt=True),
+            }
+            if self.headers.get("If-None-Match") == validators["ETag"]:
+                server.count("not_modified")
+                self._send(b"", "text/html; charset=utf-8", 304, validators)
+            else:
+                self._send(body, "text/html; charset=utf-8", headers=validators)
+            return
+
+        match = IMAGE_PATH.match(f"{url.path};{url.params}" if url.params else url.path)
+        if match:
+            server.count("images")
+            # ~0.16 байта на піксель, як у JPEG 640x480 (~50 КБ); вміст псевдовипадковий, не стискається
+            width, height = int(match.group(2) or 640), int(match.group(3) or 480)
+            body = random.Random(match.group(1)).randbytes(width * height * 16 // 100)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self._inject():
+            return
+        match = TELEGRAM_PATH.match(urlparse(self.path).path)
+        if not match:
+            self._send_json({"ok": False, "description": "Not Found"}, 404)
+            return
+        message_id = self.server.count("telegram")
+        self._send_json({"ok": True, "result": {"message_id": message_id}})
+
+
+class FakeOLXServer:
+    """
+    Фоновий HTTP-сервер. Використання: with FakeOLXServer(latency=0.3) as srv: ...
+    replay_dir - каталог з `python fake_olx.py record`; без нього все синтетичне.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, closed_rate: float = 0.0,
+                 total_offers: int = 1000, pad_kb: int = 300, state_form: str = "object",
+                 head_share: float = 0.5,
+                 replay_dir: Path = None, seed: int = 1):
+        self.httpd = ThreadingHTTPServer((host, port), FakeOLXHandler)
+        self.httpd.daemon_threads = True
+        httpd = self.httpd
+        httpd.latency = latency
+        httpd.jitter = jitter
+        httpd.error_rate = error_rate
+        httpd.throttle_rate = throttle_rate
+        httpd.total_offers = total_offers
+        httpd.started_at = datetime.now(timezone.utc)
+        httpd.counters = {}
+        httpd.lock = threading.Lock()
+        rng = random.Random(seed)
+
+        def roll():
+            with httpd.lock:
+                return rng.random()
+
+        def count(name):
+            with httpd.lock:
+                httpd.counters[name] = httpd.counters.get(name, 0) + 1
+                return httpd.counters[name]
+
+        def offers_page(offset, limit):
+            if replay_dir:
+                path = Path(replay_dir) / "offers" / f"offset_{offset}.json"
+                if not path.exists():
+                    return {"data": []}
+                return json.loads(path.read_text(encoding="utf-8").replace(OLX_BASE, self.base_url))
+            end = min(offset + limit, httpd.total_offers)
+            return {
+                "data": [make_offer(n, httpd.started_at, self.base_url) for n in range(offset, end)],
+                "metadata": {"total_elements": httpd.total_offers},
+            }
+
+        def synthetic_ad(n):
+            closed = random.Random(n * 7919).random() < closed_rate
+            if closed and n % 2:
+                return None  # половина закритих - 404, решта - status: closed
+            return make_ad(n, "closed" if closed else "active")
+
+        def ad_page(path, n):
+            if replay_dir:
+                page = Path(replay_dir) / "ads" / Path(path).name
+                return page.read_text(encoding="utf-8") if page.exists() else None
+            ad = synthetic_ad(n)
+            return render_ad_page(ad, pad_kb, state_form, head_share) if ad else None
+
+        def offer_detail(offer_id):
+            if replay_dir:
+                path = Path(replay_dir) / "offer" / f"{offer_id}.json"
+                return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+            ad = synthetic_ad(offer_id - 900000000)
+            return {"data": ad} if ad else None
+
+        httpd.roll = roll
+        httpd.count = count
+        httpd.offers_page = offers_page
+        httpd.ad_page = ad_page
+        httpd.offer_detail = offer_detail
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def offers_url(self) -> str:
+        return f"{self.base_url}/api/v1/offers"
+
+    @property
+    def counters(self) -> dict:
+        return dict(self.httpd.counters)
+
+    @property
+    def requests_served(self) -> int:
+        return sum(self.httpd.counters.values())
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# =============================
+# 📼 ЗАПИС З ЖИВОГО OLX
+# =============================
+def record(out_dir: Path, pages: int = 3, ads: int = 20):
+    """Зберігає справжні відповіді /api/v1/offers і сторінки оголошень для replay."""
+    import requests
+    import olx_monitor
+
+    out_dir = Path(out_dir)
+    (out_dir / "offers").mkdir(parents=True, exist_ok=True)
+    (out_dir / "ads").mkdir(parents=True, exist_ok=True)
+    (out_dir / "offer").mkdir(parents=True, exist_ok=True)
+    session = olx_monitor.get_session()
+
+    urls, ids = [], []
+    for i in range(pages):
+        offset = i * olx_monitor.FETCH_CONFIG["page_size"]
+        r = olx_monitor.fetch_page(offset)
+        r.raise_for_status()
+        (out_dir / "offers" / f"offset_{offset}.json").write_text(r.text, encoding="utf-8")
+        urls += [o["url"] for o in r.json().get("data", []) if o.get("url")]
+        ids += [o["id"] for o in r.json().get("data", []) if o.get("id")]
+        print(f"📼 offers offset={offset}")
+
+    for url in urls[:ads]:
+        r = session.get(url, headers={"Accept": "text/html"}, timeout=15)
+        if r.status_code == 200:
+            (out_dir / "ads" / Path(urlparse(url).path).name).write_text(r.text, encoding="utf-8")
+            print(f"📼 {url}")
+        time.sleep(random.uniform(2, 5))
+
+    for offer_id in ids[:ads]:
+        r = session.get(f"{OLX_BASE}/api/v1/offers/{offer_id}/", timeout=15)
+        if r.status_code == 200:
+            (out_dir / "offer" / f"{offer_id}.json").write_text(r.text, encoding="utf-8")
+            print(f"📼 offer {offer_id}")
+        time.sleep(random.uniform(2, 5))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OLX / Telegram server")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("serve")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.3)
+    p.add_argument("--jitter", type=float, default=0.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--throttle-rate", type=float, default=0.0)
+    p.add_argument("--closed-rate", type=float, default=0.05)
+    p.add_argument("--replay", type=Path)
+
+    p = sub.add_parser("record")
+    p.add_argument("out_dir", type=Path)
+    p.add_argument("--pages", type=int, default=3)
+    p.add_argument("--ads", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.cmd == "record":
+        record(args.out_dir, args.pages, args.ads)
+        return
+
+    srv = FakeOLXServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                        closed_rate=args.closed_rate, replay_dir=args.replay)
+    print(f"🧪 Fake OLX: {srv.offers_url}")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Зупинено.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+
+# Pillow необов'язковий: без нього кешується картинка в розмірі, який віддав CDN
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# =============================
+# 🖼 КЕШ МІНІАТЮР
+# =============================
+# app.py і ui.py більше не тягнуть фото з CDN OLX при кожному рендері:
+#   - файли лежать на диску під хешем вмісту (однакові фото різних оголошень - один файл),
+#     індекс url -> файл у маленькій SQLite-базі поруч;
+#   - у CDN просимо одразу мініатюру (;s=WxH), з Pillow ще й перестискаємо в JPEG;
+#   - розмір кешу обмежений, найдавніше переглянуті файли видаляються (LRU);
+#   - монітор у фоні завантажує мініатюри щойно знайдених оголошень.
+# Якщо мініатюри ще немає, фронтенд віддає оригінальний URL і ставить її в чергу -
+# сторінка ніколи не чекає на CDN.
+
+BASE_DIR = Path(__file__).parent.resolve()
+CACHE_DIR = BASE_DIR / "image_cache"
+
+IMAGE_CACHE_CONFIG = {
+    "thumb_size": (400, 300),
+    "jpeg_quality": 80,
+    "max_bytes": 500 * 1024 * 1024,  # після перевищення видаляємо до 90%
+    "workers": 4,                    # паралельних завантажень у prefetch
+    "timeout": 10,
+    "touch_interval": 300,           # сек; частіше last_access не переписуємо
+    "prefetch_on_ingest": True,      # olx_monitor ставить мініатюри нових оголошень у фон
+}
+
+CDN_SIZE = re.compile(r";s=\d+x\d+")
+
+
+def thumb_source_url(url: str) -> str:
+    """CDN OLX віддає будь-який розмір за ;s=WxH - просимо одразу мініатюру, а не 640x480."""
+    width, height = IMAGE_CACHE_CONFIG["thumb_size"]
+    return CDN_SIZE.sub(f";s={width}x{height}", url)
+
+
+# Без Pillow (або з форматом, який він не знає) у кеші лежать байти CDN як є - часто WebP чи PNG,
+# тож тип файлу визначаємо за сигнатурою, а не за розширенням .jpg
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def content_type(path: Path) -> str:
+    """MIME-тип файлу кешу за першими байтами."""
+    with open(path, "rb") as f:
+        head = f.read(16)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return next((mime for magic, mime in IMAGE_SIGNATURES if head.startswith(magic)), "application/octet-stream")
+
+
+def make_thumbnail(data: bytes) -> bytes:
+    if Image is None:
+        return data
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.thumbnail(IMAGE_CACHE_CONFIG["thumb_size"])
+            out = BytesIO()
+            img.convert("RGB").save(out, "JPEG", quality=IMAGE_CACHE_CONFIG["jpeg_quality"], optimize=True)
+            return out.getvalue()
+    except Exception:
+        return data  # не картинка або формат, який Pillow не знає - кешуємо як є
+
+
+class ImageCache:
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes or IMAGE_CACHE_CONFIG["max_bytes"]
+        self.db_path = self.cache_dir / "index.db"
+        self.stats = {"hits": 0, "misses": 0, "fetched": 0, "failed": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = None
+        self._session = None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")  # app, ui і монітор читають/пишуть одночасно
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_last_access ON images (last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_images_digest ON images (digest)")
+        conn.commit()
+        conn.close()
+
+    def _file(self, digest: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}.jpg"
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=IMAGE_CACHE_CONFIG["workers"])
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def lookup(self, url: str) -> Path | None:
+        """Файл мініатюри, якщо вона вже є; без мережі."""
+        if not url:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT digest, last_access FROM images WHERE url = ?", (url,)).fetchone()
+            if row is None or not self._file(row[0]).exists():
+                self._count(misses=1)
+                return None
+            now = time.time()
+            if now - row[1] > IMAGE_CACHE_CONFIG["touch_interval"]:
+                conn.execute("UPDATE images SET last_access = ? WHERE url = ?", (now, url))
+                conn.commit()
+        finally:
+            conn.close()
+        self._count(hits=1)
+        return self._file(row[0])
+
+    def fetch(self, url: str) -> Path | None:
+        """Завантажує, стискає і кладе в кеш. None, якщо CDN не віддав картинку."""
+        try:
+            r = rate_limiter.request(self._get_session(), "GET", thumb_source_url(url),
+                                     timeout=IMAGE_CACHE_CONFIG["timeout"])
+        except requests.RequestException:
+            self._count(failed=1)
+            return None
+        if r.status_code != 200 or not r.content:
+            self._count(failed=1)
+            return None
+        return self.store(url, r.content)
+
+    def store(self, url: str, data: bytes) -> Path:
+        thumb = make_thumbnail(data)
+        digest = hashlib.blake2b(thumb, digest_size=16).hexdigest()
+        path = self._file(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(thumb)
+            tmp.replace(path)  # атомарно: інший процес не прочитає половину файлу
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO images (url, digest, size, last_access) VALUES (?, ?, ?, ?)",
+                (url, digest, len(thumb), time.time()),
+            )
+            conn.commit()
+            self._evict(conn)
+        finally:
+            conn.close()
+        self._count(fetched=1)
+        return path
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        victims = []
+        for url, digest, size in conn.execute("SELECT url, digest, size FROM images ORDER BY last_access"):
+            if total <= target:
+                break
+            victims.append((url, digest))
+            total -= size
+        conn.executemany("DELETE FROM images WHERE url = ?", [(url,) for url, _ in victims])
+        conn.commit()
+        for digest in {digest for _, digest in victims}:
+            # файл спільний для кількох url - видаляємо, тільки коли посилань не лишилось
+            if not conn.execute("SELECT 1 FROM images WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                self._file(digest).unlink(missing_ok=True)
+        self._count(evicted=len(victims))
+
+    def get(self, url: str) -> Path | None:
+        """Мініатюра з кешу або (синхронно) з CDN."""
+        return self.lookup(url) or (self.fetch(url) if url else None)
+
+    def prefetch(self, urls) -> int:
+        """Завантажує відсутні мініатюри паралельно і чекає. Повертає скільки додано."""
+        missing = [url for url in dict.fromkeys(urls) if url and self.lookup(url) is None]
+        if not missing:
+            return 0
+        with ThreadPoolExecutor(max_workers=IMAGE_CACHE_CONFIG["workers"]) as pool:
+            return sum(path is not None for path in pool.map(self.fetch, missing))
+
+    def prefetch_async(self, urls):
+        """Те саме у фоні, без очікування; повторні url, що вже в черзі, пропускаються."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=IMAGE_CACHE_CONFIG["workers"], thread_name_prefix="thumbs"
+                )
+            fresh = [url for url in dict.fromkeys(urls) if url and url not in self._pending]
+            self._pending.update(fresh)
+        for url in fresh:
+            self._executor.submit(self._prefetch_one, url)
+
+    def _prefetch_one(self, url: str):
+        try:
+            if self.lookup(url) is None:
+                self.fetch(url)
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+    def wait(self):
+        """Дочекатися фонових завантажень (бенчмарки, завершення процесу)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+cache = ImageCache()
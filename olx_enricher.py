@@ -1,11 +1,22 @@
-import sqlite3
+import codecs
+import hashlib
 import time
 import requests
 import random
 import json
 import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+import car_details
+import database
+import enrich_queue
+import price_stats
+import rate_limiter
+import tombstones
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 
 # =============================
 # ⚙️ НАЛАШТУВАННЯ
@@ -16,6 +27,38 @@ DB_PATH = BASE_DIR / "cars.db"
 # Як часто перевіряти "Вибрані" (в хвилинах)
 FAVORITE_CHECK_INTERVAL = 15 
 
+# ⚡ РЕЖИМ ПЕРЕВІРКИ
+ENRICH_CONFIG = {
+    # "sequential" - по одному оголошенню з паузами 3-8 сек, як раніше
+    # "pool"       - до workers запитів одночасно, темп задає rate_limiter.HOST_LIMITS
+    "mode": "sequential",
+    "workers": 4,
+    "batch_size": 40,   # скільки рядків брати з БД за цикл у режимі pool
+    "write_batch": 10,  # скільки готових результатів писати однією транзакцією
+    # "api"  - спершу JSON /api/v1/offers/{id} (кілька КБ, без HTML), HTML лише якщо бракує полів
+    # "html" - завжди повна сторінка оголошення, як раніше
+    "source": "api",
+    # True - HTML читається шматками і з'єднання закривається, щойно прийшов __PRERENDERED_STATE__
+    "stream": True,
+    "stream_chunk": 16 * 1024,
+    # True - закрите оголошення лишається в cars з closed_at (для аналітики), False - видаляється
+    "soft_delete": True,
+}
+
+OFFER_API_URL = "https://www.olx.ua/api/v1/offers/{id}/"
+API_REQUIRED_FIELDS = ("description", "status", "params", "photos")
+
+# brotli розпаковується requests/urllib3 тільки якщо встановлено пакет brotli (або brotlicffi)
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "br, gzip, deflate"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
@@ -27,75 +70,88 @@ def get_random_headers():
         "User-Agent": random.choice(USER_AGENTS),
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
         "Referer": "https://www.olx.ua/",
+        "Accept-Encoding": ACCEPT_ENCODING,
     }
 
 # =============================
 # 🗄️ РОБОТА З БАЗОЮ
 # =============================
 def init_extended_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    new_columns = {
-        "description": "TEXT",
-        "params": "TEXT",
-        "seller_name": "TEXT",
-        "all_photos": "TEXT",
-        "is_active": "INTEGER",
-        "last_full_check": "TEXT",
-        "is_favorite": "INTEGER DEFAULT 0" # Переконаємось, що ця колонка є
-    }
-
-    cur.execute("PRAGMA table_info(cars)")
-    existing = {row[1] for row in cur.fetchall()}
-
-    for col, col_type in new_columns.items():
-        col_name = col.split()[0] # Відрізаємо DEFAULT якщо є
-        if col_name not in existing:
-            try:
-                cur.execute(f"ALTER TABLE cars ADD COLUMN {col} {col_type}")
-            except:
-                pass
-    
-    conn.commit()
-    conn.close()
+    # Колонки збагачувача, car_history, черга, tombstones, car_details - міграції database.py
+    conn = database.init(DB_PATH)
+    enrich_queue.QUEUE_CONFIG["favorite_interval"] = FAVORITE_CHECK_INTERVAL * 60
+    enrich_queue.backfill(conn)
 
 # =============================
 # 🕵️‍♂️ ЛОГІКА ПАРСИНГУ
 # =============================
+STATE_MARKER = re.compile(r"window\.__PRERENDERED_STATE__\s*=\s*")
+_json_decoder = json.JSONDecoder()
+
 def extract_json_smart(html_content):
-    start_marker = "window.__PRERENDERED_STATE__="
-    start_idx = html_content.find(start_marker)
-    
-    if start_idx == -1:
-        start_marker = "window.__PRERENDERED_STATE__ ="
-        start_idx = html_content.find(start_marker)
-        if start_idx == -1:
-            return None
-
-    json_start = html_content.find("{", start_idx)
-    if json_start == -1:
+    """
+    Декодує window.__PRERENDERED_STATE__ одним проходом json-декодера з позиції маркера,
+    тож дужки всередині рядків (опис оголошення) нічого не ламають.
+    OLX віддає стан або об'єктом {...}, або екранованим рядком "{\\"ad\\":...}".
+    """
+    match = STATE_MARKER.search(html_content)
+    if not match:
         return None
 
-    balance = 0
-    json_end = -1
-    
-    for i in range(json_start, len(html_content)):
-        char = html_content[i]
-        if char == "{":
-            balance += 1
-        elif char == "}":
-            balance -= 1
-            if balance == 0:
-                json_end = i + 1
-                break
-    
-    if json_end == -1:
+    try:
+        state, _ = _json_decoder.raw_decode(html_content, match.end())
+        if isinstance(state, str):
+            state = json.loads(state)
+    except ValueError:
         return None
 
+    return state if isinstance(state, dict) else None
+
+def ad_price(ad_data: dict):
+    """Ціна: price.regularPrice у __PRERENDERED_STATE__, параметр price у відповіді API."""
+    regular = (ad_data.get('price') or {}).get('regularPrice') or {}
+    if regular.get('value') is not None:
+        return regular['value']
+    for p in ad_data.get('params', []):
+        if p.get('key') == 'price':
+            return (p.get('value') or {}).get('value')
+    return None
+
+def description_preview(text: str) -> str:
+    return text[:500] + "..." if len(text) > 500 else text
+
+def ad_to_data(ad_data: dict) -> dict:
+    """Оголошення (з __PRERENDERED_STATE__ або з /api/v1/offers/{id}) -> поля для cars."""
+    data = {}
+    # як у cars.full_description старого збагачувача: повний текст + прев'ю на 500 символів
+    data['full_description'] = ad_data.get('description', '')
+    data['description'] = description_preview(data['full_description'])
+    data['is_active'] = 1 if ad_data.get('status') == 'active' else 0
+    data['seller_name'] = (ad_data.get('user') or {}).get('name', 'Unknown')
+    
+    params_list = ad_data.get('params', [])
+    clean_params = {}
+    for p in params_list:
+        name = p.get('name') or p.get('key')
+        value = (p.get('value') or {}).get('label')
+        if name and value:
+            clean_params[name] = value
+    data['params'] = json.dumps(clean_params, ensure_ascii=False)
+
+    photos = ad_data.get('photos', [])
+    photo_links = [p.get('link', '').replace('{width}', '1000').replace('{height}', '750') for p in photos]
+    data['all_photos'] = json.dumps(photo_links)
+    data['price_value'] = ad_price(ad_data)
+    return data
+
+def extract_api_data(payload: dict):
+    """Відповідь /api/v1/offers/{id}. None - бракує полів, треба йти в HTML."""
+    offer = (payload or {}).get('data')
+    if not isinstance(offer, dict) or any(field not in offer for field in API_REQUIRED_FIELDS):
+        return None
     try:
-        return json.loads(html_content[json_start:json_end])
-    except:
+        return ad_to_data(offer)
+    except (AttributeError, TypeError):
         return None
 
 def extract_olx_data(html_content):
@@ -106,24 +162,7 @@ def extract_olx_data(html_content):
         try:
             ad_data = state.get('ad', {}).get('ad', {})
             if ad_data:
-                data['description'] = ad_data.get('description', '')
-                data['is_active'] = 1 if ad_data.get('status') == 'active' else 0
-                data['seller_name'] = ad_data.get('user', {}).get('name', 'Unknown')
-                
-                params_list = ad_data.get('params', [])
-                clean_params = {}
-                for p in params_list:
-                    name = p.get('name') or p.get('key')
-                    value = p.get('value', {}).get('label')
-                    if name and value:
-                        clean_params[name] = value
-                data['params'] = json.dumps(clean_params, ensure_ascii=False)
-
-                photos = ad_data.get('photos', [])
-                photo_links = [p.get('link', '').replace('{width}', '1000').replace('{height}', '750') for p in photos]
-                data['all_photos'] = json.dumps(photo_links)
-                
-                return data
+                return ad_to_data(ad_data)
         except:
             pass
 
@@ -141,9 +180,12 @@ def extract_olx_data(html_content):
     desc_match = re.search(r'data-cy="ad_description".*?><div>(.*?)</div>', html_content, re.DOTALL)
     if desc_match:
         clean_desc = desc_match.group(1).replace('<br />', '\n').replace('<br>', '\n')
-        data['description'] = clean_desc[:500] + "..."
+        # решта тегів (<p>, <b>, <span>...) - у car_details і пошуковий індекс тільки текст
+        clean_desc = re.sub(r'<[^>]+>', '', clean_desc).strip()
+        data['full_description'] = clean_desc
+        data['description'] = description_preview(clean_desc)
     else:
-        data['description'] = "Опис не знайдено (Fallback)"
+        data['description'] = data['full_description'] = "Опис не знайдено (Fallback)"
 
     data['params'] = "{}"
     data['seller_name'] = "Unknown"
@@ -151,138 +193,547 @@ def extract_olx_data(html_content):
     
     return data
 
+# 📉 Лічильники збагачувача: скільки байтів прийшло по мережі, скільки зекономили 304
+ENRICH_STATS = {
+    "requests": 0, "not_modified": 0, "parsed": 0,
+    "wire_bytes": 0, "body_bytes": 0, "parse_seconds": 0.0,
+    "rows": 0, "pool_seconds": 0.0,
+    "api_requests": 0, "api_wire_bytes": 0, "api_parse_seconds": 0.0, "api_fallbacks": 0,
+    "checks": 0, "changes": 0, "closures": 0, "closure_latency": 0.0,
+    "stream_peak_bytes": 0, "stream_aborted": 0,
+    "unchanged": 0, "history_rows": 0, "errors": 0,
+}
+FETCH_LATENCIES = deque(maxlen=1000)
+_stats_lock = threading.Lock()
+
+def count(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            ENRICH_STATS[key] += value
+
+def conditional_headers(row) -> dict:
+    """If-None-Match / If-Modified-Since з валідаторів попередньої відповіді."""
+    keys = row.keys()
+    headers = {}
+    if "etag" in keys and row["etag"]:
+        headers["If-None-Match"] = row["etag"]
+    if "last_modified" in keys and row["last_modified"]:
+        headers["If-Modified-Since"] = row["last_modified"]
+    return headers
+
+def wire_size(r) -> int:
+    """Байти тіла, що реально пройшли по мережі (до розпакування gzip/br)."""
+    try:
+        return r.raw.tell()
+    except Exception:
+        return int(r.headers.get("Content-Length") or len(r.content))
+
+def percentile(samples: list, q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+def print_enrich_stats():
+    stats = ENRICH_STATS
+    full = stats["requests"] - stats["not_modified"]
+    avg_parse = stats["parse_seconds"] / stats["parsed"] if stats["parsed"] else 0
+    if stats["requests"]:
+        avg_wire = stats["wire_bytes"] / full if full else 0
+        print(f"📉 HTML: запитів {stats['requests']}, 304: {stats['not_modified']} "
+              f"(зекономлено ~{stats['not_modified'] * avg_wire / 1024:.0f} КБ і "
+              f"~{stats['not_modified'] * avg_parse:.1f} сек парсингу), "
+              f"трафік {stats['wire_bytes'] / 1024:.0f} КБ (розпаковано {stats['body_bytes'] / 1024:.0f} КБ)")
+
+    if stats["stream_aborted"]:
+        print(f"✂️ Потокове читання: {stats['stream_aborted']} сторінок обірвано після стану, "
+              f"буфер в середньому {stats['stream_peak_bytes'] / max(1, stats['parsed']) / 1024:.0f} КБ "
+              f"на запит, прочитано {stats['body_bytes'] / max(1, stats['parsed']) / 1024:.0f} КБ на оголошення")
+
+    if stats["api_requests"]:
+        api_ok = stats["api_requests"] - stats["api_fallbacks"]
+        print(f"🔌 API: {stats['api_requests']} запитів ({stats['api_fallbacks']} пішли в HTML), "
+              f"{stats['api_wire_bytes'] / stats['api_requests'] / 1024:.1f} КБ і "
+              f"{stats['api_parse_seconds'] / max(1, api_ok) * 1000:.2f} ms парсингу на оголошення; "
+              f"HTML: {stats['wire_bytes'] / max(1, full) / 1024:.1f} КБ і {avg_parse * 1000:.2f} ms")
+
+    if stats["errors"]:
+        print(f"⚠️ Помилок перевірки: {stats['errors']} (відкладено з backoff)")
+
+    if stats["unchanged"] or stats["history_rows"]:
+        print(f"🧾 Без змін (hash, UPDATE пропущено): {stats['unchanged']}, записів історії: {stats['history_rows']}")
+
+    if stats["checks"] or stats["closures"]:
+        latency = stats["closure_latency"] / stats["closures"] / 3600 if stats["closures"] else 0
+        print(f"⏳ Змін ціни/статусу: {stats['changes']} з {stats['checks']} перевірок; "
+              f"закритих {stats['closures']}, виявлено не пізніше ніж за {latency:.1f} год (в середньому)")
+
+    with _stats_lock:
+        latencies = sorted(FETCH_LATENCIES)
+    if latencies and stats["pool_seconds"]:
+        print(f"⚡ Пул: {stats['rows'] / stats['pool_seconds'] * 60:.0f} рядків/хв, затримка "
+              f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms / p95 {percentile(latencies, 0.95) * 1000:.0f} ms"
+              f" / p99 {percentile(latencies, 0.99) * 1000:.0f} ms")
+
+def fetch_ad(session, row) -> dict:
+    """
+    Мережа і парсинг без запису в БД (можна викликати з кількох потоків).
+    result: "deleted", "closed", "updated", "not_modified" або "skipped".
+    """
+    done = {"id": row['id'], "title": row['title'], "is_favorite": row['is_favorite']}
+    if ENRICH_CONFIG["source"] == "api":
+        fetched = fetch_ad_api(session, row, done)
+        if fetched:
+            return fetched
+        count(api_fallbacks=1)
+    return fetch_ad_html(session, row, done)
+
+def fetch_ad_api(session, row, done: dict):
+    """
+    JSON /api/v1/offers/{id}. None - відповідь неповна, треба HTML. 429/5xx/403 після повторів
+    rate_limiter - виняток: HTML з того ж хоста зараз теж не дадуть, черга відкладе з backoff.
+    """
+    started = time.perf_counter()
+    r = rate_limiter.request(session, "GET", OFFER_API_URL.format(id=row['id']), timeout=15,
+                             headers={"Accept": "application/json"})
+    with _stats_lock:
+        FETCH_LATENCIES.append(time.perf_counter() - started)
+    done = {**done, "now_iso": datetime.now(timezone.utc).isoformat()}
+    count(api_requests=1, api_wire_bytes=wire_size(r))
+
+    if r.status_code in (404, 410):
+        return {**done, "result": "deleted"}
+    if rate_limiter.is_retryable(r):
+        r.raise_for_status()
+    if r.status_code != 200:
+        return None
+
+    started = time.perf_counter()
+    try:
+        extracted = extract_api_data(r.json())
+    except ValueError:
+        extracted = None
+    count(api_parse_seconds=time.perf_counter() - started)
+
+    if not extracted:
+        return None
+    if extracted['is_active'] == 0:
+        return {**done, "result": "closed"}
+    return {**done, "result": "updated", "extracted": extracted, "etag": None, "last_modified": None}
+
+class StateStreamExtractor:
+    """
+    Інкрементальний пошук __PRERENDERED_STATE__: HTML подається шматками через feed(),
+    done стає True щойно об'єкт стану повністю прийшов (до </script>), решту сторінки не чекаємо.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.state = None
+        self.done = False
+        self._marker_start = None
+        self._scan_from = 0
+
+    def feed(self, text: str) -> bool:
+        self.buffer += text
+        if self.done:
+            return True
+        if self._marker_start is None:
+            # маркер міг розірватися між шматками - шукаємо з невеликим перекриттям
+            match = STATE_MARKER.search(self.buffer, max(0, self._scan_from - 64))
+            self._scan_from = len(self.buffer)
+            if not match:
+                return False
+            self._marker_start = match.start()
+            self._scan_from = match.end()
+
+        # У JSON всередині <script> рядок "</script>" завжди екранований, тож це кінець стану
+        end = self.buffer.find("</script>", max(self._marker_start, self._scan_from - 16))
+        self._scan_from = len(self.buffer)
+        if end == -1:
+            return False
+
+        self.state = extract_json_smart(self.buffer[self._marker_start:end])
+        self.done = True
+        return True
+
+    @property
+    def ad(self):
+        """Оголошення зі стану або None (стан не розібрався чи в ньому немає ad)."""
+        return (self.state or {}).get('ad', {}).get('ad') if self.done else None
+
+def read_streaming(r):
+    """
+    Читає тіло шматками до кінця __PRERENDERED_STATE__ і закриває з'єднання.
+    Якщо стан прийшов, але не розібрався, дочитує сторінку до кінця: опис для fallback
+    стоїть після стану, і розбір обрізаної голови затер би car_details заглушкою.
+    Повертає (extracted, прочитано байтів, пік буфера, сек парсингу, обірвано раніше).
+    """
+    extractor = StateStreamExtractor()
+    decoder = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+    read = 0
+    parse_seconds = 0.0
+    aborted = False
+    try:
+        for chunk in r.iter_content(chunk_size=ENRICH_CONFIG["stream_chunk"]):
+            read += len(chunk)
+            started = time.perf_counter()
+            done = extractor.feed(decoder.decode(chunk))
+            parse_seconds += time.perf_counter() - started
+            if done and extractor.ad:
+                aborted = True
+                break
+    finally:
+        # Недочитане з'єднання не повертається в пул - це ціна раннього обриву
+        r.close()
+
+    started = time.perf_counter()
+    if aborted:
+        extracted = ad_to_data(extractor.ad)
+    else:
+        # Стану немає або він не розібрався, сторінка дочитана - звичайний розбір з fallback
+        extracted = extract_olx_data(extractor.buffer + decoder.decode(b"", final=True))
+    parse_seconds += time.perf_counter() - started
+    return extracted, read, len(extractor.buffer), parse_seconds, aborted
+
+def fetch_ad_html(session, row, done: dict) -> dict:
+    """Сторінка оголошення з умовним запитом і розбором __PRERENDERED_STATE__."""
+    url = row['ad_url']
+    stream = ENRICH_CONFIG["stream"]
+
+    started = time.perf_counter()
+    r = rate_limiter.request(session, "GET", url, timeout=15, allow_redirects=True,
+                             headers=conditional_headers(row), stream=stream)
+    done = {**done, "now_iso": datetime.now(timezone.utc).isoformat()}
+
+    # 304: сторінка не змінилась з минулої перевірки - не качаємо і не парсимо
+    if r.status_code == 304:
+        r.close()
+        with _stats_lock:
+            FETCH_LATENCIES.append(time.perf_counter() - started)
+        count(requests=1, not_modified=1)
+        return {**done, "result": "not_modified"}
+    
+    # Перевірка 404
+    if r.status_code == 404 or (r.url != url and "obyavlenie" not in r.url):
+        r.close()
+        count(requests=1, wire_bytes=wire_size(r))
+        return {**done, "result": "deleted"}
+
+    # 403 (блокування) чи 429/5xx після повторів rate_limiter - не сторінка; "error" з backoff черги
+    if r.status_code >= 400:
+        r.close()
+        count(requests=1, wire_bytes=wire_size(r))
+        r.raise_for_status()
+
+    if stream:
+        extracted, body_bytes, peak, parse_seconds, aborted = read_streaming(r)
+        count(stream_peak_bytes=peak, stream_aborted=aborted)
+    else:
+        body_bytes = len(r.content)
+        parse_started = time.perf_counter()
+        extracted = extract_olx_data(r.text)
+        parse_seconds = time.perf_counter() - parse_started
+    with _stats_lock:
+        FETCH_LATENCIES.append(time.perf_counter() - started)
+    count(requests=1, wire_bytes=wire_size(r), body_bytes=body_bytes,
+          parsed=1, parse_seconds=parse_seconds)
+
+    if not extracted:
+        return {**done, "result": "skipped"}
+
+    if extracted['is_active'] == 0:
+        return {**done, "result": "closed"}
+
+    return {
+        **done, "result": "updated", "extracted": extracted,
+        "etag": r.headers.get('ETag'), "last_modified": r.headers.get('Last-Modified'),
+    }
+
+def detect_change(prev, extracted: dict):
+    """
+    Чи змінилась ціна або статус з минулої перевірки. None - порівнювати нема з чим
+    (перша перевірка або ціну не вдалося дістати).
+    """
+    if prev is None or prev['last_full_check'] is None:
+        return None
+    if prev['is_active'] != 1:
+        return True
+    price = extracted.get('price_value')
+    if price is None or prev['price_value'] is None:
+        return None
+    return float(price) != float(prev['price_value'])
+
+def content_hash(extracted: dict) -> str:
+    """Відбиток усього, що збагачувач пише в cars: однаковий - UPDATE не потрібен."""
+    payload = json.dumps([
+        extracted['full_description'], extracted['params'], extracted['seller_name'],
+        extracted['all_photos'], extracted.get('price_value'),
+    ], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def record_history(cur, car_id, changed_at: str, prev, extracted: dict = None, is_active: int = 1):
+    """
+    Дописує в car_history тільки поля, що змінились з минулої перевірки.
+    Перша перевірка (нема з чим порівнювати) нічого не пише.
+    """
+    if prev is None or prev['last_full_check'] is None:
+        return
+    delta = {}
+    if prev['is_active'] != is_active:
+        delta['is_active'] = is_active
+    if extracted:
+        price = extracted.get('price_value')
+        if price is not None and prev['price_value'] is not None and float(price) != float(prev['price_value']):
+            delta['price_value'] = price
+        description_len = car_details.description_len(extracted)
+        if description_len != (prev['description_len'] or 0):
+            delta['description_len'] = description_len
+        photos = car_details.photo_count(extracted['all_photos'])
+        if photos != (prev['photo_count'] or 0):
+            delta['photo_count'] = photos
+    if delta:
+        columns = ", ".join(delta)
+        cur.execute(
+            f"INSERT INTO car_history (car_id, changed_at, {columns}) VALUES (?, ?{', ?' * len(delta)})",
+            (car_id, changed_at, *delta.values()),
+        )
+        count(history_rows=1)
+
+def save_results(conn, results: list):
+    """
+    Записує групу перевірок однією транзакцією і планує наступну перевірку кожного.
+    Виняток посеред групи відкочує всю групу (без напівзаписаних tombstones і price_stats).
+    """
+    try:
+        write_results(conn, results)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def write_results(conn, results: list):
+    cur = conn.cursor()
+    for done in results:
+        title = done["title"]
+        prev = cur.execute("""
+            SELECT c.is_active, c.price_value, c.price_uah, c.created_at, c.last_full_check,
+                   c.content_hash, d.description_len, d.photo_count
+            FROM cars c LEFT JOIN car_details d ON d.car_id = c.id
+            WHERE c.id = ?
+        """, (done["id"],)).fetchone()
+        changed = None
+
+        if done["result"] == "error":
+            # Сторінку не отримали - це не перевірка: last_full_check лишається, черга відкладає з backoff
+            delay = enrich_queue.reschedule_error(conn, done["id"])
+            count(errors=1)
+            print(f"⚠️ [ПОМИЛКА] {title[:30]}... (повтор через {delay / 60:.0f} хв)")
+            continue
+
+        if done["result"] in ("deleted", "closed"):
+            if done["result"] == "deleted":
+                print(f"❌ [ВИДАЛЕНО] {title[:30]}... (404/Redirect)")
+            else:
+                print(f"❌ [ЗАКРИТО] {title[:30]}... (Status: Closed)")
+            # Закрили десь між попередньою перевіркою і цією - це верхня межа затримки виявлення
+            checked = enrich_queue.parse_check_time(prev['last_full_check']) if prev else 0
+            if checked:
+                count(closures=1, closure_latency=time.time() - checked)
+            record_history(cur, done["id"], done["now_iso"], prev, is_active=0)
+            tombstones.bury(cur, done["id"], done["result"], ENRICH_CONFIG["soft_delete"], done["now_iso"])
+            enrich_queue.remove(conn, done["id"])
+            continue
+
+        if done["result"] == "not_modified":
+            print(f"💤 [БЕЗ ЗМІН] {title[:30]}... (304)")
+            changed = False
+            cur.execute("UPDATE cars SET last_full_check = ? WHERE id = ?", (done["now_iso"], done["id"]))
+        elif done["result"] == "skipped":
+            print(f"⚠️ Не вдалося отримати дані для {title[:20]} (Skip)")
+            cur.execute("UPDATE cars SET last_full_check = ? WHERE id = ?", (done["now_iso"], done["id"]))
+        else:
+            extracted = done["extracted"]
+            changed = detect_change(prev, extracted)
+            digest = content_hash(extracted)
+
+            if prev is not None and prev['content_hash'] == digest and prev['is_active'] == 1:
+                # Нічого не змінилось: важкі текстові колонки не переписуємо
+                print(f"💤 [БЕЗ ЗМІН] {title[:30]}... (hash)")
+                count(unchanged=1)
+                cur.execute("""
+                    UPDATE cars SET 
+                        last_full_check = ?,
+                        etag = COALESCE(?, etag),
+                        last_modified = COALESCE(?, last_modified)
+                    WHERE id = ?
+                """, (done["now_iso"], done["etag"], done["last_modified"], done["id"]))
+            else:
+                prefix = "⭐ [ВИБРАНЕ]" if done["is_favorite"] else "✅ [ОНОВЛЕНО]"
+                print(f"{prefix} {title[:30]}... (Active)")
+                record_history(cur, done["id"], done["now_iso"], prev, extracted)
+                car_details.save(cur, done["id"], extracted)
+                cur.execute("""
+                    UPDATE cars SET 
+                        seller_name = ?, 
+                        is_active = 1,
+                        last_full_check = ?,
+                        etag = COALESCE(?, etag),
+                        last_modified = COALESCE(?, last_modified),
+                        content_hash = ?
+                    WHERE id = ?
+                """, (
+                    extracted['seller_name'],
+                    done["now_iso"],
+                    done["etag"],
+                    done["last_modified"],
+                    digest,
+                    done["id"]
+                ))
+                if changed and extracted.get('price_value') is not None and prev['price_value']:
+                    # Нова ціна в тій самій валюті; price_uah перераховуємо пропорційно
+                    price_stats.remove_cars(cur, [done["id"]])
+                    cur.execute("""
+                        UPDATE cars SET
+                            price_uah = CAST(ROUND(price_uah * 1.0 * ? / price_value) AS INTEGER),
+                            price_value = ?
+                        WHERE id = ?
+                    """, (extracted['price_value'], extracted['price_value'], done["id"]))
+                    price_stats.add_cars(cur, [done["id"]])
+
+        count(checks=1, changes=bool(changed))
+        enrich_queue.reschedule(
+            conn, done["id"], done["is_favorite"], changed,
+            prev['created_at'] if prev else None, prev['price_uah'] if prev else None,
+        )
+
+def save_or_defer(conn, results: list):
+    """save_results; якщо запис упав (напр. database is locked) - група відкладається як помилка."""
+    try:
+        save_results(conn, results)
+    except Exception as e:
+        print(f"⚠️ Помилка запису ({len(results)} шт): {e}")
+        defer_errors(conn, [done["id"] for done in results])
+
+def defer_errors(conn, car_ids: list):
+    """reschedule_error для кожного оголошення окремою транзакцією."""
+    try:
+        with conn:
+            for car_id in car_ids:
+                enrich_queue.reschedule_error(conn, car_id)
+        count(errors=len(car_ids))
+    except Exception as e:
+        print(f"⚠️ Не вдалося відкласти {len(car_ids)} оголошень: {e}")
+
+def safe_fetch_ad(session, row) -> dict:
+    """fetch_ad, але виняток (мережа, парсинг) - результат "error", який save_results відкладе з backoff."""
+    try:
+        return fetch_ad(session, row)
+    except Exception as e:
+        print(f"⚠️ Помилка з'єднання: {e}")
+        return {"id": row['id'], "title": row['title'], "is_favorite": row['is_favorite'], "result": "error"}
+
+def check_ad(session, conn, row) -> str:
+    """Одна перевірка оголошення з записом результату. Повертає fetch_ad(...)["result"]."""
+    done = safe_fetch_ad(session, row)
+    save_or_defer(conn, [done])
+    return done["result"]
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Спільна сесія пулу: keep-alive і до ENRICH_CONFIG["workers"] з'єднань на хост."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=ENRICH_CONFIG["workers"])
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(get_random_headers())
+            _session = session
+        return _session
+
+def check_ads_pool(conn, rows) -> list:
+    """
+    До ENRICH_CONFIG["workers"] запитів одночасно; швидкість на хост тримає rate_limiter.
+    Результати пишуться групами по ENRICH_CONFIG["write_batch"] у міру завершення.
+    """
+    session = get_session()
+    started = time.perf_counter()
+    results, group = [], []
+
+    with ThreadPoolExecutor(max_workers=ENRICH_CONFIG["workers"]) as pool:
+        for future in as_completed([pool.submit(safe_fetch_ad, session, row) for row in rows]):
+            done = future.result()
+            results.append(done["result"])
+            group.append(done)
+            if len(group) >= ENRICH_CONFIG["write_batch"]:
+                save_or_defer(conn, group)
+                group = []
+    if group:
+        save_or_defer(conn, group)
+
+    count(rows=len(rows), pool_seconds=time.perf_counter() - started)
+    return results
+
 # =============================
 # 🚀 ГОЛОВНИЙ ЦИКЛ
 # =============================
 def main_loop():
     init_extended_db()
-    print("🕵️‍♂️ Запуск 'Збагачувача' з пріоритетом ВИБРАНИХ...")
+    pool_mode = ENRICH_CONFIG["mode"] == "pool"
+    batch = ENRICH_CONFIG["batch_size"] if pool_mode else 5
+    print(f"🕵️‍♂️ Запуск 'Збагачувача' з пріоритетом ВИБРАНИХ ({ENRICH_CONFIG['mode']})...")
     
     session = requests.Session()
 
     while True:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-
-        # Розрахунок часу для повторної перевірки вибраних
-        # (Зараз мінус 15 хвилин)
-        check_threshold = (datetime.now(timezone.utc) - timedelta(minutes=FAVORITE_CHECK_INTERVAL)).isoformat()
-
-        # ---------------------------------------------------------
-        # 1. ПРІОРИТЕТ: ВИБРАНІ (Favorites)
-        # Перевіряємо, якщо вони не перевірялися останні 15 хв
-        # ---------------------------------------------------------
-        cur.execute("""
-            SELECT id, ad_url, title, is_favorite 
-            FROM cars 
-            WHERE is_favorite = 1 
-            AND (last_full_check IS NULL OR last_full_check < ?)
-            ORDER BY last_full_check ASC
-            LIMIT 5
-        """, (check_threshold,))
-        rows = cur.fetchall()
-        priority_mode = False
-
-        if rows:
+        conn = database.get_connection(DB_PATH)
+
+        # Вибрані, потім нові (без опису), потім звичайне коло - все з черги enrich_queue
+        rows = enrich_queue.next_batch(conn, batch)
+        priority_mode = bool(rows) and rows[0]['priority'] == enrich_queue.FAVORITE
+
+        if priority_mode:
             print(f"\n⭐ ПЕРЕВІРКА ВИБРАНИХ ({len(rows)} шт)...")
-            priority_mode = True
-        else:
-            # ---------------------------------------------------------
-            # 2. ПРІОРИТЕТ: НОВІ (Без опису)
-            # ---------------------------------------------------------
-            cur.execute("""
-                SELECT id, ad_url, title, is_favorite 
-                FROM cars 
-                WHERE description IS NULL OR is_active IS NULL
-                ORDER BY created_at DESC 
-                LIMIT 5
-            """)
-            rows = cur.fetchall()
-            
-            if not rows:
-                # ---------------------------------------------------------
-                # 3. ПРІОРИТЕТ: СТАРІ (Звичайне коло перевірки)
-                # ---------------------------------------------------------
-                cur.execute("""
-                    SELECT id, ad_url, title, is_favorite 
-                    FROM cars 
-                    WHERE is_favorite = 0
-                    ORDER BY last_full_check ASC 
-                    LIMIT 5
-                """)
-                rows = cur.fetchall()
 
         if not rows:
-            print("💤 База порожня або всі перевірені. Сплю 2 хвилини...")
-            conn.close()
+            print("💤 Черга порожня або всі перевірені. Сплю 2 хвилини...")
             time.sleep(120)
             continue
 
         if not priority_mode:
             print(f"\n🔍 Обробка {len(rows)} оголошень...")
 
+        if pool_mode:
+            # Без людських пауз: темп задає спільний ліміт запитів (rate_limiter.HOST_LIMITS)
+            try:
+                check_ads_pool(conn, rows)
+            except Exception as e:
+                # save_or_defer вже ловить помилки запису; сюди - лише непередбачене, процес живе далі
+                print(f"⚠️ Помилка пулу: {e}")
+                defer_errors(conn, [row['id'] for row in rows])
+            print_enrich_stats()
+            continue
+
         for row in rows:
-            car_id = row['id']
-            url = row['ad_url']
-            title = row['title']
-            is_fav = row['is_favorite']
-            
             session.headers.update(get_random_headers())
 
             try:
-                r = session.get(url, timeout=15, allow_redirects=True)
-                now_iso = datetime.now(timezone.utc).isoformat()
-                
-                # Перевірка 404
-                if r.status_code == 404 or (r.url != url and "obyavlenie" not in r.url):
-                    print(f"❌ [ВИДАЛЕНО] {title[:30]}... (404/Redirect)")
-                    cur.execute("DELETE FROM cars WHERE id = ?", (car_id,))
-                    conn.commit()
-                    time.sleep(random.uniform(2, 5))
-                    continue
-
-                extracted = extract_olx_data(r.text)
-
-                if extracted:
-                    if extracted['is_active'] == 0:
-                        print(f"❌ [ЗАКРИТО] {title[:30]}... (Status: Closed)")
-                        cur.execute("DELETE FROM cars WHERE id = ?", (car_id,))
-                    else:
-                        prefix = "⭐ [ВИБРАНЕ]" if is_fav else "✅ [ОНОВЛЕНО]"
-                        print(f"{prefix} {title[:30]}... (Active)")
-                        
-                        cur.execute("""
-                            UPDATE cars SET 
-                                description = ?, 
-                                params = ?, 
-                                seller_name = ?, 
-                                all_photos = ?, 
-                                is_active = 1,
-                                last_full_check = ?
-                            WHERE id = ?
-                        """, (
-                            extracted['description'],
-                            extracted['params'],
-                            extracted['seller_name'],
-                            extracted['all_photos'],
-                            now_iso,
-                            car_id
-                        ))
-                    conn.commit()
-                else:
-                    print(f"⚠️ Не вдалося отримати дані для {title[:20]} (Skip)")
-                    cur.execute("UPDATE cars SET last_full_check = ? WHERE id = ?", (now_iso, car_id))
-                    conn.commit()
-
+                result = check_ad(session, conn, row)
             except Exception as e:
-                print(f"⚠️ Помилка з'єднання: {e}")
+                print(f"⚠️ Помилка: {e}")
+                defer_errors(conn, [row['id']])
+                result = "error"
+
+            if result == "deleted":
+                time.sleep(random.uniform(2, 5))
+                continue
             
             sleep_time = random.uniform(3, 8)
             print(f"⏳ Пауза... ({sleep_time:.1f}s)")
             time.sleep(sleep_time)
 
-        conn.close()
+        print_enrich_stats()
         
         long_sleep = random.randint(15, 45)
         print(f"💤 Перерва... ({long_sleep}s)")
@@ -292,4 +743,4 @@ if __name__ == "__main__":
     try:
         main_loop()
     except KeyboardInterrupt:
-        print("\n🛑 Зупинено.")
\ No newline at end of file
+        print("\n🛑 Зупинено.")
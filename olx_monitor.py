@@ -1,9 +1,22 @@
-import sqlite3
 import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 import random
+import json
+from collections import deque
+
+import database
+import enrich_queue
+import image_cache
+import price_stats
+import rate_limiter
+from scheduler import AdaptiveScheduler
+from stop_words import StopWordMatcher
+from tombstones import TombstoneSet
 
 
 # =============================
@@ -14,17 +27,8 @@ DB_PATH = BASE_DIR / "cars.db"
 API_URL = "https://www.olx.ua/api/v1/offers"
 CATEGORY_CARS_ID = 1532
 
-# 🛑 СТОП-СЛОВА
-STOP_WORDS = [
-    "трактор", "мотоблок", "причіп", "прицеп", "скутер", "Купави", "кав’ярні", 
-    "мотоцикл", "квадроцикл", "навантажувач", "погрузчик", 
-    "комбайн", "запчастини", "розборка", "шрот", "двигун", 
-    "кпп", "сівалка", "плуг", "борона", "мопед", "велосипед",
-    "scooter", "moto", "atv", "tractor", "разборка", "Баштовий кран", "Посівний комплекс", "грузовий", "косарка", "шнек", "погрузчик", "бочка", "цистерна", "прицеп", "причіп", "трейлер", "телега", "пропелер", "гідроборт",
-    # 🔥 НОВЫЕ СЛОВА ИЗ ВАШЕГО ЛОГА:
-    "диски", "шини", "резина", "колеса", "мотор", "двигатель", 
-    "акпп", "двері", "крило", "бампер", "фари", "салон"
-]
+# 🛑 СТОП-СЛОВА (редагуються у stop_words.txt, підхоплюються без перезапуску)
+STOP_WORDS_PATH = BASE_DIR / "stop_words.txt"
 
 # 🔍 НАСТРОЙКИ ПОИСКА И ФИЛЬТРОВ
 SEARCH_CONFIG = {
@@ -39,6 +43,44 @@ SEARCH_CONFIG = {
     "filter_date_from": "2025-12-01" 
 }
 
+# 🗂️ ПРОФІЛІ ПОШУКУ
+# Кожен профіль - окремий пошук (категорія, ціна, регіон, запит) зі своїм high-water mark.
+# Всі профілі опитуються паралельно, ділять один бюджет запитів (rate_limiter.HOST_LIMITS)
+# і не пишуть в БД одне й те саме оголошення двічі за цикл.
+SEARCH_PROFILES = [
+    {"name": "default", "category_id": CATEGORY_CARS_ID, **SEARCH_CONFIG},
+    # {"name": "kyiv-cheap", "category_id": CATEGORY_CARS_ID, "region_id": 25,
+    #  "filter_float_price:from": 20000, "filter_float_price:to": 200000, "filter_date_from": "2025-12-01"},
+    # {"name": "leaf", "category_id": CATEGORY_CARS_ID, "q": "nissan leaf"},
+]
+
+# 🌐 НАЛАШТУВАННЯ ЗАВАНТАЖЕННЯ СТОРІНОК
+FETCH_CONFIG = {
+    # "concurrent" - всі offsets паралельно через один пул з'єднань
+    # "sequential" - по одній сторінці з паузою, як раніше
+    "mode": "concurrent",
+    "offsets": (0, 50, 100),
+    # "incremental" - від offset 0 вглиб, поки на сторінці є нові оголошення (high-water mark)
+    # "fixed"       - завжди рівно FETCH_CONFIG["offsets"]
+    "crawl": "incremental",
+    "page_size": 50,
+    "max_pages": 20,             # межа глибини для incremental, навіть під час сплеску
+    "max_workers": 3,            # скільки запитів одночасно в польоті
+    "sequential_delay": (3, 7),  # пауза перед кожним запитом у режимі sequential
+    "pool_size": 10,
+}
+
+# ⏱️ РОЗКЛАД ОПИТУВАННЯ
+# adaptive=True - інтервал залежить від того, скільки оголошень зазвичай з'являється в цю годину
+# adaptive=False - як раніше, random(600, 900)
+SCHEDULER_CONFIG = {
+    "adaptive": True,
+    "min_interval": 180,
+    "max_interval": 1800,
+    "polls_per_day": 115,
+    "history_days": 14,
+}
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept": "application/json",
@@ -48,70 +90,115 @@ HEADERS = {
 # =============================
 # 🗄️ РАБОТА С БАЗОЙ ДАННЫХ
 # =============================
+TYPED_COLUMNS = {
+    "city_id": "INTEGER",
+    "city_name": "TEXT",
+    "district_id": "INTEGER",
+    "region_id": "INTEGER",
+    "region_name": "TEXT",
+    "negotiable": "INTEGER",
+    "trade": "INTEGER",
+}
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS cars (
-            id TEXT PRIMARY KEY,
-            title TEXT,
-            price_value INTEGER,
-            price_currency TEXT,
-            price_uah INTEGER,
-            price_raw TEXT,
-            location_raw TEXT,
-            image_url TEXT,
-            ad_url TEXT,
-            created_at TEXT
+    # Схема і прагми - у database.py (спільні міграції для всіх процесів)
+    database.init(DB_PATH)
+
+    # Закриті оголошення (404 / closed) більше ніколи не вставляємо
+    global closed_ads
+    closed_ads = TombstoneSet(DB_PATH)
+    print(f"🪦 Закритих оголошень у пам'яті: {len(closed_ads)}")
+
+def load_state(key: str):
+    conn = database.get_connection(DB_PATH)
+    row = conn.execute("SELECT value FROM monitor_state WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def save_state(key: str, value):
+    conn = database.get_connection(DB_PATH)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO monitor_state (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
         )
-    """)
-    conn.commit()
-    conn.close()
-
-def save_car_and_verify(car: dict) -> bool:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    start_changes = conn.total_changes
-
-    cur.execute("""
-        INSERT OR IGNORE INTO cars (
-            id, title, price_value, price_currency, price_uah, 
-            price_raw, location_raw, image_url, ad_url, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        car["id"], car["title"], car["price_value"], car["price_currency"], 
-        car["price_uah"], car["price_raw"], car["location_raw"], 
-        car["image_url"], car["ad_url"], car["created_at"],
-    ))
-    conn.commit()
-    
-    was_inserted = (conn.total_changes > start_changes)
-    
-    if was_inserted:
-        cur.execute("SELECT * FROM cars WHERE id = ?", (car['id'],))
-        row = cur.fetchone()
-        if row:
-            db_record = dict(row)
-            # Виводимо реальну дату створення оголошення
-            print(f"\n💾 [SAVED] ID: {db_record['id']}")
-            print(f"   📅 Date:  {db_record['created_at']}") 
-            print(f"   💰 Price: {db_record['price_uah']} UAH")
-            print("-" * 50)
-
-    conn.close()
-    return was_inserted
+
+CAR_COLUMNS = (
+    "id", "title", "price_value", "price_currency", "price_uah",
+    "price_raw", "location_raw", "image_url", "ad_url", "created_at",
+) + tuple(TYPED_COLUMNS)
+
+# Лічильники пакетного запису (для оцінки пропускної здатності)
+INGEST_STATS = {"rows": 0, "new": 0, "batches": 0, "seconds": 0.0}
+
+def save_cars_batch(cars: list) -> list:
+    """Пише цілу сторінку однією транзакцією. Повертає тільки реально нові авто."""
+    if not cars:
+        return []
+
+    started = time.perf_counter()
+    conn = database.get_connection(DB_PATH)
+    try:
+        # IMMEDIATE: ніхто інший не вставить ці ID між нашим SELECT і INSERT
+        conn.execute("BEGIN IMMEDIATE")
+        ids = list({car["id"] for car in cars})
+        existing = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT id FROM cars WHERE id IN ({placeholders})", chunk
+            ))
+
+        conn.executemany(
+            f"INSERT OR IGNORE INTO cars ({', '.join(CAR_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(CAR_COLUMNS))})",
+            [tuple(car[col] for col in CAR_COLUMNS) for car in cars],
+        )
+        # Нові оголошення одразу потрапляють у чергу збагачувача і в цінову аналітику
+        inserted = [car_id for car_id in ids if car_id not in existing]
+        enrich_queue.enqueue_new(conn, inserted)
+        price_stats.add_cars(conn, inserted)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+    new_cars = []
+    for car in cars:
+        if car["id"] not in existing:
+            existing.add(car["id"])  # дублікати всередині пакета рахуємо один раз
+            new_cars.append(car)
+
+    INGEST_STATS["rows"] += len(cars)
+    INGEST_STATS["new"] += len(new_cars)
+    INGEST_STATS["batches"] += 1
+    INGEST_STATS["seconds"] += time.perf_counter() - started
+    return new_cars
+
+def ingest_throughput() -> float:
+    """Рядків за секунду, що пройшли через save_cars_batch."""
+    if not INGEST_STATS["seconds"]:
+        return 0.0
+    return INGEST_STATS["rows"] / INGEST_STATS["seconds"]
 
 # =============================
 # 🛠️ ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # =============================
-def extract_prices(offer_data: dict):
+stop_words = StopWordMatcher(STOP_WORDS_PATH)
+closed_ads = set()  # TombstoneSet після init_db()
+
+def find_price(offer_data: dict):
     price = offer_data.get("price")
     if not price and "params" in offer_data:
         for param in offer_data["params"]:
             if param.get("key") == "price":
                 price = param.get("value")
                 break
+    return price if isinstance(price, dict) else None
+
+def extract_prices(offer_data: dict):
+    price = find_price(offer_data)
     if not price: return None, None, None
     value = price.get("value")
     currency = price.get("currency")
@@ -119,32 +206,331 @@ def extract_prices(offer_data: dict):
     price_uah = int(converted) if converted else (int(value) if currency == "UAH" and value else None)
     return value, currency, price_uah
 
-def fetch_page(offset: int):
+def parse_location(location) -> dict:
+    """location з API -> city_id, city_name, district_id, region_id, region_name."""
+    location = location if isinstance(location, dict) else {}
+    city = location.get("city") or {}
+    district = location.get("district") or {}
+    region = location.get("region") or {}
+    return {
+        "city_id": city.get("id"),
+        "city_name": city.get("name"),
+        "district_id": district.get("id"),
+        "region_id": region.get("id"),
+        "region_name": region.get("name"),
+    }
+
+def parse_price_flags(price) -> dict:
+    price = price if isinstance(price, dict) else {}
+    flags = {}
+    for key in ("negotiable", "trade"):
+        value = price.get(key)
+        flags[key] = None if value is None else int(bool(value))
+    return flags
+
+def offer_to_car(o: dict, min_date: str = None):
+    """Оголошення з API -> рядок для cars, або None якщо його треба пропустити."""
+    # 1. Стоп-слова
+    if stop_words.matches(o.get("title", "")): return None
+
+    # 2. Фото
+    photos = o.get("photos") or []
+    if not photos: return None
+
+    # 3. 🔥 ОТРИМАННЯ РЕАЛЬНОЇ ДАТИ
+    # API повертає created_time (напр. "2023-12-17T14:30:00+02:00")
+    real_date_str = o.get("created_time") or o.get("last_refresh_time")
+    
+    if not real_date_str:
+        # Якщо дати немає, беремо поточну
+        real_date_str = datetime.now(timezone.utc).isoformat()
+
+    # 4. 🔥 ФІЛЬТР ПО ДАТІ (В СКРИПТІ)
+    if min_date:
+        # Порівнюємо рядки (ISO формат дозволяє це робити коректно)
+        # Беремо перші 10 символів (YYYY-MM-DD)
+        if real_date_str[:10] < min_date:
+            return None
+
+    p_val, p_curr, p_uah = extract_prices(o)
+
+    return {
+        "id": str(o["id"]),
+        "title": o.get("title"),
+        "price_value": p_val,
+        "price_currency": p_curr,
+        "price_uah": p_uah,
+        "price_raw": str(o.get("price")),
+        "location_raw": str(o.get("location")),
+        "image_url": photos[0]["link"].replace("{width}", "640").replace("{height}", "480"),
+        "ad_url": o.get("url"),
+        "created_at": real_date_str, # Зберігаємо реальну дату
+        **parse_location(o.get("location")),
+        **parse_price_flags(find_price(o)),
+    }
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Одна сесія на процес: keep-alive, gzip і пул з'єднань замість TCP+TLS на кожен запит."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=FETCH_CONFIG["pool_size"],
+                pool_maxsize=FETCH_CONFIG["pool_size"],
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+                "Referer": "https://www.olx.ua/",
+                "Connection": "keep-alive",
+            })
+            _session = session
+        return _session
+
+PROFILE_FILTERS = ("q", "filter_float_price:from", "filter_float_price:to", "region_id", "city_id")
+
+def build_params(offset: int, profile: dict = None) -> dict:
+    profile = profile or SEARCH_PROFILES[0]
     params = {
         "offset": offset,
-        "limit": 50,
-        "category_id": CATEGORY_CARS_ID,
+        "limit": FETCH_CONFIG["page_size"],
+        "category_id": profile.get("category_id", CATEGORY_CARS_ID),
         # "sort_by": SEARCH_CONFIG["sort_by"]  <-- ЗАКОММЕНТИРОВАЛИ ЭТО (частая причина ошибки 500)
     }
     
     # Добавляем фильтры только если они есть
-    if SEARCH_CONFIG["q"]: 
-        params["q"] = SEARCH_CONFIG["q"]
-        
-    if SEARCH_CONFIG["filter_float_price:from"]: 
-        params["filter_float_price:from"] = SEARCH_CONFIG["filter_float_price:from"]
-        
-    if SEARCH_CONFIG["filter_float_price:to"]: 
-        params["filter_float_price:to"] = SEARCH_CONFIG["filter_float_price:to"]
-
-    # Обновленный заголовок, чтобы меньше походить на бота
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json",
-        "Referer": "https://www.olx.ua/",
-    }
+    for key in PROFILE_FILTERS:
+        if profile.get(key):
+            params[key] = profile[key]
+
+    return params
 
-    return requests.get(API_URL, headers=headers, params=params, timeout=15)
+# 📈 Статистика по профілях: запити, помилки, нові, дублікати, затримка
+PROFILE_STATS = {}
+_stats_lock = threading.Lock()
+
+def profile_stats(name: str) -> dict:
+    with _stats_lock:
+        return PROFILE_STATS.setdefault(name, {
+            "requests": 0, "errors": 0, "new": 0, "duplicates": 0, "closed": 0,
+            "latencies": deque(maxlen=500),
+        })
+
+def fetch_page(offset: int, profile: dict = None):
+    stats = profile_stats((profile or SEARCH_PROFILES[0])["name"])
+    started = time.perf_counter()
+    try:
+        # Бюджет запитів, backoff і breaker спільні з іншими процесами (див. rate_limiter.py)
+        r = rate_limiter.request(get_session(), "GET", API_URL, params=build_params(offset, profile), timeout=15)
+    except Exception:
+        with _stats_lock:
+            stats["requests"] += 1
+            stats["errors"] += 1
+        raise
+    with _stats_lock:
+        stats["requests"] += 1
+        stats["errors"] += r.status_code != 200
+        stats["latencies"].append(time.perf_counter() - started)
+    return r
+
+def fetch_pages(offsets, profile: dict = None):
+    """Тягне всі offsets одночасно. Повертає [(offset, response | Exception)] у тому ж порядку."""
+    def safe_fetch(offset):
+        try:
+            return fetch_page(offset, profile)
+        except Exception as e:
+            return e
+
+    workers = max(1, min(FETCH_CONFIG["max_workers"], len(offsets)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(safe_fetch, offsets))
+    return list(zip(offsets, results))
+
+def iter_pages(offsets, profile: dict = None):
+    """Відповіді по сторінках згідно з FETCH_CONFIG["mode"]."""
+    if FETCH_CONFIG["mode"] == "concurrent":
+        yield from fetch_pages(offsets, profile)
+        return
+
+    for offset in offsets:
+        sleep_time = random.uniform(*FETCH_CONFIG["sequential_delay"])
+        print(f"⏳ Чекаю {sleep_time:.1f} сек перед запитом...")
+        time.sleep(sleep_time)
+        try:
+            yield offset, fetch_page(offset, profile)
+        except Exception as e:
+            yield offset, e
+
+# =============================
+# 🧭 ОБХІД СТОРІНОК
+# =============================
+def offer_mark(o: dict):
+    """(created_time у UTC, id) - за цим ключем порівнюємо оголошення з high-water mark."""
+    raw = o.get("created_time") or o.get("last_refresh_time")
+    if not raw:
+        return None
+    try:
+        created = datetime.fromisoformat(raw).astimezone(timezone.utc)
+        return created.isoformat(timespec="microseconds"), int(o["id"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def report_new_car(car: dict):
+    print(f"🟢 [NEW] {car['title']}")
+    print(f"   📅 {car['created_at']}   💰 {car['price_uah']} UAH")
+    print(f"   🔗 {car['ad_url']}")
+    print("=" * 50)
+
+# ID, які вже забрав якийсь профіль у поточному циклі (дедуплікація до запису в БД)
+_cycle_seen = set()
+_cycle_lock = threading.Lock()
+
+def claim_cars(cars: list) -> list:
+    """Залишає тільки ті авто, які ще не бачив жоден інший профіль у цьому циклі."""
+    with _cycle_lock:
+        claimed = [car for car in cars if car["id"] not in _cycle_seen]
+        _cycle_seen.update(car["id"] for car in claimed)
+    return claimed
+
+def process_page(r, profile: dict):
+    """Відповідь API -> (offers, нові авто). Кидає виняток, якщо сторінка не отримана."""
+    if isinstance(r, Exception):
+        raise r
+    if r.status_code != 200:
+        raise RuntimeError(f"Ошибка API: {r.status_code}")
+
+    offers = r.json().get("data", [])
+    min_date = profile.get("filter_date_from")
+    cars = [car for car in (offer_to_car(o, min_date) for o in offers) if car]
+    open_cars = [car for car in cars if car["id"] not in closed_ads]
+    claimed = claim_cars(open_cars)
+    new_cars = save_cars_batch(claimed)
+
+    stats = profile_stats(profile["name"])
+    with _stats_lock:
+        stats["new"] += len(new_cars)
+        stats["duplicates"] += len(open_cars) - len(claimed)
+        stats["closed"] += len(cars) - len(open_cars)
+
+    if new_cars and image_cache.IMAGE_CACHE_CONFIG["prefetch_on_ingest"]:
+        # Мініатюри нових оголошень вантажаться у фоні, поки монітор читає наступні сторінки
+        image_cache.cache.prefetch_async(car["image_url"] for car in new_cars)
+
+    for car in new_cars:
+        report_new_car(car)
+    return offers, new_cars
+
+def crawl_fixed(profile: dict) -> int:
+    new_cars_count = 0
+    for offset, r in iter_pages(FETCH_CONFIG["offsets"], profile):
+        try:
+            _, new_cars = process_page(r, profile)
+            new_cars_count += len(new_cars)
+        except Exception as e:
+            print(f"❌ [{profile['name']}] Ошибка: {e}")
+    return new_cars_count
+
+def crawl_incremental(profile: dict) -> int:
+    """
+    Йдемо від offset 0 вглиб, поки сторінки містять щось новіше за high-water mark.
+    Перша сторінка - одна; якщо вона вся свіжа (сплеск), далі тягнемо по max_workers сторінок.
+    """
+    # У профілю "default" ключ без суфікса - сумісно зі станом, збереженим до появи профілів
+    state_key = "high_water_mark" if profile["name"] == "default" else f"high_water_mark:{profile['name']}"
+    state = load_state(state_key)
+    mark = (state["time"], state["id"]) if state else None
+    newest = mark
+    page_size = FETCH_CONFIG["page_size"]
+
+    if mark is None:
+        # Перший запуск: немає з чим порівнювати, скануємо як раніше
+        window = list(FETCH_CONFIG["offsets"])
+    else:
+        window = [0]
+
+    new_cars_count = 0
+    pages = 0
+    failed = False
+    while window:
+        go_deeper = True
+        for offset, r in iter_pages(window, profile):
+            pages += 1
+            try:
+                offers, new_cars = process_page(r, profile)
+            except Exception as e:
+                print(f"❌ [{profile['name']}] Ошибка: {e}")
+                go_deeper = False
+                failed = True
+                continue
+
+            new_cars_count += len(new_cars)
+            marks = [m for m in map(offer_mark, offers) if m]
+            if marks:
+                newest = max(newest, max(marks)) if newest else max(marks)
+
+            fresh = bool(new_cars) or (mark is not None and any(m > mark for m in marks))
+            if len(offers) < page_size or not fresh:
+                go_deeper = False
+
+        next_offset = window[-1] + page_size
+        if mark is None or not go_deeper or pages >= FETCH_CONFIG["max_pages"]:
+            break
+
+        size = min(FETCH_CONFIG["max_workers"], FETCH_CONFIG["max_pages"] - pages)
+        window = [next_offset + i * page_size for i in range(size)]
+        print(f"🌊 [{profile['name']}] Сплеск нових оголошень - йду глибше (offset {window[0]}..{window[-1]})")
+
+    if failed:
+        # Оголошення зі сторінки, що впала, старші за newest - з новою міткою їх би вже не шукали
+        print(f"⚠️ [{profile['name']}] Не всі сторінки отримано - high-water mark лишається старим")
+    elif newest and newest != mark:
+        save_state(state_key, {"time": newest[0], "id": newest[1]})
+
+    print(f"🧭 [{profile['name']}] Переглянуто сторінок: {pages}")
+    return new_cars_count
+
+_profile_pool = None
+_profile_workers = 0
+
+def profile_pool(workers: int) -> ThreadPoolExecutor:
+    """Один пул на весь запуск: потоки (і їх з'єднання з БД) живуть між циклами, а не множаться."""
+    global _profile_pool, _profile_workers
+    if _profile_pool is None or _profile_workers != workers:
+        if _profile_pool is not None:
+            _profile_pool.shutdown(wait=True)
+        _profile_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="profile")
+        _profile_workers = workers
+    return _profile_pool
+
+def crawl_profiles(profiles: list) -> int:
+    """Один цикл по всіх профілях паралельно. Повертає кількість нових авто."""
+    with _cycle_lock:
+        _cycle_seen.clear()
+
+    crawl = crawl_incremental if FETCH_CONFIG["crawl"] == "incremental" else crawl_fixed
+    if len(profiles) == 1:
+        return crawl(profiles[0])
+
+    return sum(profile_pool(len(profiles)).map(crawl, profiles))
+
+def print_profile_stats():
+    for name, stats in PROFILE_STATS.items():
+        latencies = sorted(stats["latencies"])
+        if latencies:
+            avg = sum(latencies) / len(latencies) * 1000
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+            latency = f"{avg:.0f} ms avg / {p95:.0f} ms p95"
+        else:
+            latency = "-"
+        print(f"📈 [{name}] запитів {stats['requests']} (помилок {stats['errors']}), "
+              f"нових {stats['new']}, дублікатів {stats['duplicates']}, закритих {stats['closed']}, {latency}")
 
 # =============================
 # 🚀 ОСНОВНОЙ ЦИКЛ
@@ -154,83 +540,36 @@ def main():
     print(f"🚀 OLX Monitor запущен.")
     print(f"📂 База данных: {DB_PATH}")
     
-    min_date = SEARCH_CONFIG.get("filter_date_from")
-    if min_date:
-        print(f"📅 Фільтр дати: зберігаємо тільки новіші за {min_date}")
+    for profile in SEARCH_PROFILES:
+        min_date = profile.get("filter_date_from")
+        date_note = f", тільки новіші за {min_date}" if min_date else ""
+        print(f"🗂️ Профіль [{profile['name']}]: категорія {profile.get('category_id', CATEGORY_CARS_ID)}{date_note}")
     
     print("-" * 50)
 
+    scheduler = AdaptiveScheduler(DB_PATH, SCHEDULER_CONFIG) if SCHEDULER_CONFIG["adaptive"] else None
+
     while True:
-        new_cars_count = 0
-        
-        for offset in (0, 50, 100):
-            try:
-                sleep_time = random.uniform(3, 7)
-                print(f"⏳ Чекаю {sleep_time:.1f} сек перед запитом...")
-                time.sleep(sleep_time)
-
-                r = fetch_page(offset)
-                if r.status_code != 200:
-                    print(f"⚠️ Ошибка API: {r.status_code}")
-                    continue
-
-                offers = r.json().get("data", [])
-                
-                for o in offers:
-                    # 1. Стоп-слова
-                    title = o.get("title", "").lower()
-                    if any(word in title for word in STOP_WORDS): continue
-
-                    # 2. Фото
-                    photos = o.get("photos") or []
-                    if not photos: continue
-
-                    # 3. 🔥 ОТРИМАННЯ РЕАЛЬНОЇ ДАТИ
-                    # API повертає created_time (напр. "2023-12-17T14:30:00+02:00")
-                    real_date_str = o.get("created_time") or o.get("last_refresh_time")
-                    
-                    if not real_date_str:
-                        # Якщо дати немає, беремо поточну
-                        real_date_str = datetime.now(timezone.utc).isoformat()
-
-                    # 4. 🔥 ФІЛЬТР ПО ДАТІ (В СКРИПТІ)
-                    if min_date:
-                        # Порівнюємо рядки (ISO формат дозволяє це робити коректно)
-                        # Беремо перші 10 символів (YYYY-MM-DD)
-                        if real_date_str[:10] < min_date:
-                            # print(f"⏭ Пропуск: старе оголошення від {real_date_str[:10]}")
-                            continue
-
-                    p_val, p_curr, p_uah = extract_prices(o)
-
-                    car = {
-                        "id": str(o["id"]),
-                        "title": o.get("title"),
-                        "price_value": p_val,
-                        "price_currency": p_curr,
-                        "price_uah": p_uah,
-                        "price_raw": str(o.get("price")),
-                        "location_raw": str(o.get("location")),
-                        "image_url": photos[0]["link"].replace("{width}", "640").replace("{height}", "480"),
-                        "ad_url": o.get("url"),
-                        "created_at": real_date_str, # Зберігаємо реальну дату
-                    }
-
-                    if save_car_and_verify(car):
-                        new_cars_count += 1
-                        print(f"🟢 [NEW] {car['title']}")
-                        print(f"   🔗 {car['ad_url']}")
-                        print("=" * 50)
+        stop_words.reload_if_changed()
+        closed_ads.refresh()
+        cycle_started = time.monotonic()
 
-            except Exception as e:
-                print(f"❌ Ошибка: {e}")
+        new_cars_count = crawl_profiles(SEARCH_PROFILES)
+
+        print(f"🌐 Сторінки оброблено за {time.monotonic() - cycle_started:.1f} сек ({FETCH_CONFIG['mode']})")
+
+        print_profile_stats()
+
+        if INGEST_STATS["batches"]:
+            print(f"💾 Запис у БД: {ingest_throughput():.0f} рядків/сек "
+                  f"({INGEST_STATS['rows']} рядків, {INGEST_STATS['batches']} транзакцій)")
 
         if new_cars_count == 0:
-            print(f"💤 Нових авто немає. Чекаю 10 хвилин...")
+            print(f"💤 Нових авто немає.")
         else:
             print(f"✅ Додано {new_cars_count} нових авто.")
 
-        wait_time = random.randint(600, 900)
+        wait_time = scheduler.next_interval() if scheduler else random.randint(600, 900)
         print(f"💤 Сплю {wait_time} секунд...")
         time.sleep(wait_time)
 
@@ -0,0 +1,178 @@
+import json
+import math
+
+
+# =============================
+# 📈 ЦІНОВА АНАЛІТИКА
+# =============================
+# Агрегати price_uah по (день, область, марка) ведуться інкрементально:
+#   olx_monitor.save_cars_batch  -> add_cars     (нові оголошення)
+#   tombstones.bury              -> remove_cars  (закрите оголошення виходить з ринку)
+#   olx_enricher.save_results    -> remove + add (змінилась ціна)
+# Кожне оголошення потрапляє у 8 рядків: кожен вимір або конкретний, або "всі" (ALL_DAYS,
+# ALL_REGIONS, ALL_MAKES). Тож "Київська область, усі марки, весь час" - це один рядок,
+# а не прохід по cars. Діапазон дат - сума денних рядків (їх сотні, не сотні тисяч).
+#
+# Медіана і перцентилі - з гістограми з логарифмічними кошиками (крок 15%): її можна
+# додавати і віднімати, тому вона переживає закриття оголошень (t-digest так не вміє).
+
+ALL_DAYS = "*"
+ALL_REGIONS = -1
+ALL_MAKES = "*"
+UNKNOWN_REGION = 0
+
+HIST_MIN = 10_000     # грн, нижня межа першого кошика
+HIST_STEP = 1.15      # кожен кошик на 15% ширший за попередній
+HIST_BUCKETS = 90     # до ~2.9 млрд грн; все вище - в останній кошик
+
+
+def make_of(title) -> str:
+    """Марка - перше слово заголовка ("Volkswagen Passat B7" -> "Volkswagen")."""
+    words = (title or "").split()
+    return words[0].capitalize() if words else ""
+
+
+def bucket(price: int) -> int:
+    if price <= HIST_MIN:
+        return 0
+    return min(HIST_BUCKETS - 1, int(math.log(price / HIST_MIN) / math.log(HIST_STEP)))
+
+
+def bucket_value(index: int, fraction: float = 0.5) -> float:
+    """Ціна всередині кошика (fraction 0..1 у лог-шкалі); 0.5 - геометрична середина."""
+    return HIST_MIN * HIST_STEP ** (index + fraction)
+
+
+def _keys(day: str, region_id, make: str):
+    for d in (day, ALL_DAYS):
+        for r in (region_id or UNKNOWN_REGION, ALL_REGIONS):
+            for m in (make, ALL_MAKES):
+                yield d, r, m
+
+
+def _apply(conn, rows, sign: int):
+    """rows: (price_uah, created_at, region_id, title). Один UPSERT на кожен зачеплений рядок агрегатів."""
+    deltas = {}
+    for price, created_at, region_id, title in rows:
+        if not price or price <= 0:
+            continue
+        b = str(bucket(price))
+        for key in _keys((created_at or "")[:10], region_id, make_of(title)):
+            entry = deltas.setdefault(key, [0, 0, {}])
+            entry[0] += sign
+            entry[1] += sign * price
+            entry[2][b] = entry[2].get(b, 0) + sign
+
+    for key, (count, total, hist) in deltas.items():
+        row = conn.execute(
+            "SELECT count, total, hist FROM price_stats WHERE day = ? AND region_id = ? AND make = ?", key
+        ).fetchone()
+        if row:
+            count += row[0]
+            total += row[1]
+            merged = json.loads(row[2])
+            for b, n in hist.items():
+                merged[b] = merged.get(b, 0) + n
+            hist = merged
+        hist = {b: n for b, n in hist.items() if n > 0}
+        if count <= 0:
+            conn.execute("DELETE FROM price_stats WHERE day = ? AND region_id = ? AND make = ?", key)
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO price_stats (day, region_id, make, count, total, hist) VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, count, total, json.dumps(hist, separators=(",", ":"), sort_keys=True)),
+        )
+
+
+def _car_rows(conn, car_ids) -> list:
+    rows = []
+    car_ids = list(car_ids)
+    for i in range(0, len(car_ids), 500):
+        chunk = car_ids[i:i + 500]
+        rows += conn.execute(f"""
+            SELECT price_uah, created_at, region_id, title FROM cars
+            WHERE id IN ({','.join('?' * len(chunk))}) AND closed_at IS NULL
+        """, chunk).fetchall()
+    return rows
+
+
+def add_cars(conn, car_ids):
+    """Після вставки/зміни ціни. Виклик всередині транзакції того, хто пише cars."""
+    _apply(conn, _car_rows(conn, car_ids), +1)
+
+
+def remove_cars(conn, car_ids):
+    """До закриття/зміни ціни (поки рядок ще відкритий і зі старою ціною)."""
+    _apply(conn, _car_rows(conn, car_ids), -1)
+
+
+def rebuild(conn):
+    """Перерахунок з нуля (міграція, або якщо агрегати розійшлися з cars)."""
+    conn.execute("DELETE FROM price_stats")
+    cursor = conn.execute("SELECT price_uah, created_at, region_id, title FROM cars WHERE closed_at IS NULL")
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        _apply(conn, rows, +1)
+
+
+def summarize(rows) -> dict:
+    """Рядки (count, total, hist) -> кількість, середня, p25/медіана/p75."""
+    count, total, hist = 0, 0, [0] * HIST_BUCKETS
+    for row_count, row_total, row_hist in rows:
+        count += row_count
+        total += row_total
+        for b, n in json.loads(row_hist).items():
+            hist[int(b)] += n
+    result = {"count": count, "mean": round(total / count) if count else None}
+    for name, q in (("p25", 0.25), ("median", 0.5), ("p75", 0.75)):
+        result[name] = percentile(hist, count, q)
+    return result
+
+
+def percentile(hist: list, count: int, q: float):
+    if not count:
+        return None
+    rank, seen = q * count, 0
+    for index, n in enumerate(hist):
+        if n and seen + n >= rank:
+            # усередині кошика ціни вважаємо рівномірними в лог-шкалі
+            return round(bucket_value(index, (rank - seen) / n))
+        seen += n
+    return round(bucket_value(len(hist) - 1))
+
+
+def summary(conn, region_id: int = None, make: str = None, start_date: str = None, end_date: str = None) -> dict:
+    """Агрегат для фільтра. Без дат - один рядок; з датами - сума денних рядків."""
+    region = ALL_REGIONS if region_id is None else region_id
+    make = ALL_MAKES if not make else make_of(make)
+    if not start_date and not end_date:
+        rows = conn.execute(
+            "SELECT count, total, hist FROM price_stats WHERE day = ? AND region_id = ? AND make = ?",
+            (ALL_DAYS, region, make),
+        ).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT count, total, hist FROM price_stats
+            WHERE region_id = ? AND make = ? AND day != ? AND day >= ? AND day <= ?
+        """, (region, make, ALL_DAYS, start_date or "", (end_date or "9999-12-31")[:10])).fetchall()
+    return summarize(rows)
+
+
+def breakdown(conn, by: str, region_id: int = None, make: str = None, limit: int = 50) -> list:
+    """Агрегати по днях / областях / марках (решта вимірів - фільтр або "всі"), за кількістю."""
+    region = ALL_REGIONS if region_id is None else region_id
+    make = ALL_MAKES if not make else make_of(make)
+    where = {
+        "day": ("day != ? AND region_id = ? AND make = ?", (ALL_DAYS, region, make)),
+        "region": ("day = ? AND region_id != ? AND make = ?", (ALL_DAYS, ALL_REGIONS, make)),
+        "make": ("day = ? AND region_id = ? AND make != ?", (ALL_DAYS, region, ALL_MAKES)),
+    }[by]
+    order = "day DESC" if by == "day" else "count DESC"
+    rows = conn.execute(f"""
+        SELECT day, region_id, make, count, total, hist FROM price_stats
+        WHERE {where[0]} ORDER BY {order} LIMIT ?
+    """, (*where[1], limit)).fetchall()
+    column = {"day": 0, "region": 1, "make": 2}[by]
+    return [{by: row[column], **summarize([row[3:]])} for row in rows]
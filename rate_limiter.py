@@ -0,0 +1,195 @@
+import sqlite3
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+
+# =============================
+# 🚦 СПІЛЬНИЙ ЛІМІТ ЗАПИТІВ
+# =============================
+# Монітор, збагачувачі і Telegram-нотифікатор - окремі процеси (run_all.py).
+# Щоб вони мали спільний погляд на те, як сильно ми навантажуємо хост, стан
+# token bucket, backoff і circuit breaker лежить у маленькій SQLite-базі
+# (BEGIN IMMEDIATE = міжпроцесне блокування).
+
+BASE_DIR = Path(__file__).parent.resolve()
+LIMITER_DB_PATH = BASE_DIR / "ratelimit.db"
+
+# rate - запитів за секунду на хост (сумарно для всіх процесів), burst - скільки можна одразу.
+# rate = 0 вимикає ліміт (але backoff і breaker працюють).
+# blocked - статуси, якими хост блокує (анти-бот); для них, як для 429/5xx, backoff і повтор.
+HOST_LIMITS = {
+    "www.olx.ua": {"rate": 0.5, "burst": 3, "blocked": (403,)},
+    "api.telegram.org": {"rate": 1.0, "burst": 5},
+    "ireland.apollo.olxcdn.com": {"rate": 5.0, "burst": 10},  # мініатюри image_cache
+}
+DEFAULT_LIMIT = {"rate": 1.0, "burst": 3}
+
+BACKOFF_CONFIG = {
+    "base": 5,                 # перша пауза після помилки, сек
+    "max": 600,                # найдовша пауза backoff, сек
+    "failure_threshold": 5,    # скільки помилок поспіль відкривають breaker
+    "breaker_cooldown": 300,   # на скільки breaker зупиняє всі процеси для хоста, сек
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value) -> float | None:
+    """Retry-After буває в секундах або HTTP-датою."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class SharedRateLimiter:
+    def __init__(self, db_path: Path = LIMITER_DB_PATH, limits: dict = None,
+                 default_limit: dict = None, backoff: dict = None):
+        self.db_path = db_path
+        self.limits = HOST_LIMITS if limits is None else limits
+        self.default_limit = default_limit or DEFAULT_LIMIT
+        self.backoff = {**BACKOFF_CONFIG, **(backoff or {})}
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous = OFF")  # стан лімітера не критичний
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                tokens REAL,
+                updated_at REAL,
+                blocked_until REAL DEFAULT 0,
+                failures INTEGER DEFAULT 0
+            )
+        """)
+        conn.close()
+
+    def _limit(self, host: str) -> dict:
+        return self.limits.get(host, self.default_limit)
+
+    def _load(self, conn, host: str, now: float):
+        row = conn.execute(
+            "SELECT tokens, updated_at, blocked_until, failures FROM hosts WHERE host = ?", (host,)
+        ).fetchone()
+        if row is None:
+            burst = self._limit(host)["burst"]
+            conn.execute(
+                "INSERT INTO hosts (host, tokens, updated_at) VALUES (?, ?, ?)", (host, burst, now)
+            )
+            return float(burst), now, 0.0, 0
+        return row
+
+    def acquire(self, host: str):
+        """Блокує, доки для хоста не буде вільного токена і не мине backoff/breaker."""
+        limit = self._limit(host)
+        announced = False
+        while True:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                tokens, updated_at, blocked_until, failures = self._load(conn, host, now)
+
+                wait = 0.0
+                if blocked_until > now:
+                    wait = blocked_until - now
+                elif limit["rate"]:
+                    tokens = min(limit["burst"], tokens + (now - updated_at) * limit["rate"])
+                    if tokens >= 1:
+                        tokens -= 1
+                    else:
+                        wait = (1 - tokens) / limit["rate"]
+                    conn.execute(
+                        "UPDATE hosts SET tokens = ?, updated_at = ? WHERE host = ?", (tokens, now, host)
+                    )
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+            if not wait:
+                return
+            if blocked_until > now and not announced:
+                print(f"🚦 {host}: пауза {wait:.0f} сек (помилок поспіль: {failures})")
+                announced = True
+            time.sleep(min(wait, 30))
+
+    def retryable(self, host: str, status_code: int) -> bool:
+        return status_code in RETRY_STATUSES or status_code in self._limit(host).get("blocked", ())
+
+    def report(self, host: str, status_code: int = None, retry_after: float = None):
+        """Результат запиту. status_code=None - мережева помилка."""
+        failed = status_code is None or self.retryable(host, status_code)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            _, _, blocked_until, failures = self._load(conn, host, now)
+
+            if not failed:
+                conn.execute("UPDATE hosts SET failures = 0 WHERE host = ?", (host,))
+            else:
+                failures += 1
+                delay = min(self.backoff["max"], self.backoff["base"] * 2 ** (failures - 1))
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if failures >= self.backoff["failure_threshold"]:
+                    delay = max(delay, self.backoff["breaker_cooldown"])
+                    print(f"🔌 {host}: circuit breaker відкрито на {delay:.0f} сек "
+                          f"({failures} помилок поспіль)")
+                conn.execute(
+                    "UPDATE hosts SET failures = ?, blocked_until = ? WHERE host = ?",
+                    (failures, max(blocked_until, now + delay), host),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+
+limiter = SharedRateLimiter()
+
+
+def is_retryable(r) -> bool:
+    """Відповідь з тих, що request повторює (429/5xx, блокування хоста): хост гальмує нас, а не відповів."""
+    return limiter.retryable(urlparse(r.url).hostname or "", r.status_code)
+
+
+def request(session, method: str, url: str, retries: int = 2, **kwargs):
+    """
+    session.request(...) під спільним лімітом. 429/5xx, блокування хоста (HOST_LIMITS "blocked")
+    і мережеві помилки повторюються (до `retries` разів) після backoff; остання відповідь
+    повертається як є. Відкинуту відповідь закриваємо: зі stream=True вона тримає з'єднання пулу.
+    `session` - requests.Session або сам модуль requests.
+    """
+    host = urlparse(url).hostname or ""
+    for attempt in range(retries + 1):
+        limiter.acquire(host)
+        try:
+            r = session.request(method, url, **kwargs)
+        except Exception:
+            limiter.report(host, None)
+            if attempt == retries:
+                raise
+            continue
+
+        limiter.report(host, r.status_code, parse_retry_after(r.headers.get("Retry-After")))
+        if not limiter.retryable(host, r.status_code) or attempt == retries:
+            return r
+        r.close()
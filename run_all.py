@@ -23,7 +23,7 @@ else:
 # Список скриптів для запуску
 scripts = [
     "olx_monitor.py",   # Шукає нові авто
-    "olx_enricher copy.py",  # Перевіряє та додає деталі
+    "olx_enricher.py",  # Перевіряє та додає деталі
     "app.py"            # Запускає сайт
 ]
 
@@ -0,0 +1,98 @@
+import math
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone, timedelta
+
+import database
+
+
+# =============================
+# ⏱️ АДАПТИВНИЙ РОЗКЛАД ОПИТУВАННЯ
+# =============================
+# Оцінюємо, скільки нових оголошень з'являється в кожну годину доби (за created_at у БД),
+# і ділимо добовий бюджет опитувань пропорційно sqrt(швидкості): так мінімізується
+# середня затримка виявлення при тій самій загальній кількості запитів.
+
+DEFAULT_CONFIG = {
+    "min_interval": 180,       # не частіше, ніж раз на 3 хв (пік)
+    "max_interval": 1800,      # не рідше, ніж раз на 30 хв (ніч)
+    "polls_per_day": 115,      # добовий бюджет ≈ старий random(600, 900)
+    "history_days": 14,        # скільки днів історії брати для оцінки
+    "prior_per_hour": 1.0,     # згладжування для годин без даних
+    "jitter": 0.15,            # ±15% випадковості, щоб не виглядати як cron
+    "refresh_every": 3600,     # як часто перераховувати план, сек
+}
+
+
+def hourly_rates(db_path, days: int) -> list:
+    """Середня кількість нових оголошень на кожну годину доби (локальний час)."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    counts = [0] * 24
+
+    conn = database.get_connection(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT created_at FROM cars WHERE created_at >= ?", (since.date().isoformat(),)
+        )
+        for (created_at,) in rows:
+            try:
+                created = datetime.fromisoformat(created_at)
+            except (TypeError, ValueError):
+                continue
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            if created >= since:
+                counts[created.astimezone().hour] += 1
+    except sqlite3.OperationalError:
+        pass  # таблиці ще немає
+
+    return [c / days for c in counts]
+
+
+def plan_intervals(rates: list, config: dict) -> list:
+    """24 інтервали (сек): частіше в години пік, рідше вночі, сумарно не більше бюджету."""
+    lo, hi = config["min_interval"], config["max_interval"]
+    budget = config["polls_per_day"]
+
+    weights = [math.sqrt(r + config["prior_per_hour"]) for r in rates]
+    total_weight = sum(weights)
+    intervals = [min(hi, max(lo, 3600 / (budget * w / total_weight))) for w in weights]
+
+    # Після обрізання по min_interval бюджет може бути перевищено - розтягуємо всі інтервали
+    for _ in range(20):
+        polls = sum(3600 / i for i in intervals)
+        if polls <= budget * 1.001:
+            break
+        factor = polls / budget
+        intervals = [min(hi, max(lo, i * factor)) for i in intervals]
+
+    return intervals
+
+
+class AdaptiveScheduler:
+    def __init__(self, db_path, config: dict = None):
+        self.db_path = db_path
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.intervals = None
+        self.planned_at = 0.0
+
+    def refresh(self):
+        rates = hourly_rates(self.db_path, self.config["history_days"])
+        self.intervals = plan_intervals(rates, self.config)
+        self.planned_at = time.monotonic()
+
+        peak = min(range(24), key=lambda h: self.intervals[h])
+        quiet = max(range(24), key=lambda h: self.intervals[h])
+        polls = sum(3600 / i for i in self.intervals)
+        print(f"⏱️ Розклад: пік о {peak:02d}:00 - кожні {self.intervals[peak] / 60:.0f} хв, "
+              f"тиша о {quiet:02d}:00 - кожні {self.intervals[quiet] / 60:.0f} хв "
+              f"(~{polls:.0f} опитувань/добу)")
+
+    def next_interval(self, now: datetime = None) -> int:
+        if self.intervals is None or time.monotonic() - self.planned_at > self.config["refresh_every"]:
+            self.refresh()
+
+        hour = (now or datetime.now()).astimezone().hour
+        jitter = self.config["jitter"]
+        return int(self.intervals[hour] * random.uniform(1 - jitter, 1 + jitter))
@@ -0,0 +1,104 @@
+import json
+import re
+
+
+# =============================
+# 🔎 ПОВНОТЕКСТОВИЙ ПОШУК (FTS5)
+# =============================
+# cars_fts - один документ на оголошення (rowid = cars.rowid): заголовок, місто/область,
+# повний опис і параметри ("Вид палива Дизель Модель Passat ..."). Таблиця contentless
+# (content=''): тільки індекс, текст лишається стиснутим у car_details. Синхронізація:
+#   INSERT / DELETE / UPDATE заголовка чи міста в cars -> тригери міграції 14; старий текст
+#                                                         для видалення - car_detail_text();
+#   car_details.save                                 -> reindex (старий і новий текст
+#                                                         знає сам save).
+# Токенізатор unicode61 ділить за Unicode-класами і згортає регістр, зокрема кирилиці
+# ("ДИЗЕЛЬ" = "дизель"), remove_diacritics 2 - латинські діакритики ("Škoda" = "skoda").
+# Стемера для української/російської в SQLite немає, тому кожне слово запиту - префікс:
+# "дизел" знайде "дизельний", "passat" - "Passat B7". prefix='2 3' - окремі індекси
+# коротких префіксів, тож "vw*" не перебирає весь словник.
+
+WEIGHTS = (10.0, 2.0, 1.0, 3.0)  # bm25: збіг у заголовку важить більше, ніж у тексті опису
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def flatten_params(params) -> str:
+    """JSON {"Вид палива": "Дизель", ...} -> "Вид палива Дизель ..." для індексу."""
+    try:
+        parsed = json.loads(params or "{}")
+    except (TypeError, ValueError):
+        return ""
+    if not isinstance(parsed, dict):
+        return ""
+    return " ".join(f"{name} {value}" for name, value in parsed.items())
+
+
+def match_query(text: str):
+    """
+    Рядок з поля пошуку -> вираз MATCH: кожне слово - префікс у лапках, усі слова обов'язкові
+    ("passat диз" -> '"passat"* "диз"*'). Лапки знешкоджують синтаксис FTS5 (OR, NEAR, дужки)
+    у введенні користувача. None - шукати нічого.
+    """
+    words = TOKEN.findall(text or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def location_sql(row: str = "") -> str:
+    """Вираз для колонки location; однаковий у тригерах і тут, інакше 'delete' не збіжиться."""
+    return f"trim(coalesce({row}city_name, '') || ' ' || coalesce({row}region_name, ''))"
+
+
+def reindex(conn, car_id, old: tuple, new: tuple):
+    """
+    Замінює (опис, параметри) документа оголошення. Contentless FTS5 видаляє документ
+    тільки за тим самим текстом, з яким його індексували, тому потрібен і old.
+    Виклик всередині транзакції, що пише car_details.
+    """
+    if old == new:
+        return
+    conn.execute(f"""
+        INSERT INTO cars_fts (cars_fts, rowid, title, location, description, params)
+        SELECT 'delete', rowid, title, {location_sql()}, ?, ? FROM cars WHERE id = ?
+    """, (*old, car_id))
+    conn.execute(f"""
+        INSERT INTO cars_fts (rowid, title, location, description, params)
+        SELECT rowid, title, {location_sql()}, ?, ? FROM cars WHERE id = ?
+    """, (*new, car_id))
+
+
+def rebuild(conn):
+    """Індекс наново з cars і car_details (міграція, або якщо індекс розійшовся з даними)."""
+    conn.execute("INSERT INTO cars_fts (cars_fts) VALUES ('delete-all')")
+    conn.execute(f"""
+        INSERT INTO cars_fts (rowid, title, location, description, params)
+        SELECT c.rowid, c.title, {location_sql('c.')},
+               car_detail_text(d.data, 'description'), car_detail_text(d.data, 'params')
+        FROM cars c LEFT JOIN car_details d ON d.car_id = c.id
+    """)
+
+
+def condition(text: str):
+    """(SQL-умова над cars, параметри) для фільтрів списку або None, якщо запит порожній."""
+    query = match_query(text)
+    if query is None:
+        return None
+    return "cars.rowid IN (SELECT rowid FROM cars_fts WHERE cars_fts MATCH ?)", [query]
+
+
+def ranked(conn, text: str, columns=("id",), where=(), params=(), limit: int = 50) -> list:
+    """Найрелевантніші відкриті оголошення: bm25 з вагами WEIGHTS, далі новіші. limit=-1 - усі."""
+    query = match_query(text)
+    if query is None:
+        return []
+    conditions = ["closed_at IS NULL", *where]
+    return conn.execute(f"""
+        SELECT {', '.join(f'cars.{col}' for col in columns)}
+        FROM (
+            SELECT rowid, bm25(cars_fts, {', '.join(map(str, WEIGHTS))}) AS rank
+            FROM cars_fts WHERE cars_fts MATCH ?
+        ) AS hits
+        JOIN cars ON cars.rowid = hits.rowid
+        WHERE {' AND '.join(conditions)}
+        ORDER BY hits.rank, cars.created_at DESC
+        LIMIT ?
+    """, (query, *params, limit)).fetchall()
@@ -0,0 +1,68 @@
+import os
+import re
+import unicodedata
+from pathlib import Path
+
+
+# =============================
+# 🛑 СТОП-СЛОВА
+# =============================
+# Один скомпільований регулярний вираз замість any(word in title for word in ...).
+# Слова беруться з текстового файлу і перечитуються, коли файл змінився.
+
+APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "‘": "'", "`": "'", "´": "'"})
+
+
+def normalize(text: str) -> str:
+    """NFKC + casefold + один вид апострофа + одинарні пробіли."""
+    text = unicodedata.normalize("NFKC", text or "").translate(APOSTROPHES).casefold()
+    return " ".join(text.split())
+
+
+def load_words(path: Path) -> list:
+    words = []
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                words.append(line)
+    return words
+
+
+def compile_words(words) -> re.Pattern | None:
+    variants = sorted({normalize(w) for w in words if normalize(w)}, key=len, reverse=True)
+    if not variants:
+        return None
+    return re.compile("|".join(map(re.escape, variants)))
+
+
+class StopWordMatcher:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.pattern = None
+        self.words = []
+        self.mtime = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """Перечитує файл, якщо він змінився з минулого разу. Повертає True після перезавантаження."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.mtime is None:
+                print(f"⚠️ Файл стоп-слів не знайдено: {self.path}")
+                self.mtime = 0
+            return False
+
+        if mtime == self.mtime:
+            return False
+
+        words = load_words(self.path)
+        self.pattern = compile_words(words)
+        self.words = words
+        self.mtime = mtime
+        print(f"🛑 Стоп-слова завантажено: {len(words)} шт ({self.path.name})")
+        return True
+
+    def matches(self, title: str) -> bool:
+        return self.pattern is not None and self.pattern.search(normalize(title)) is not None
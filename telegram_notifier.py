@@ -1,24 +1,22 @@
-import sqlite3
 import time
 import requests
+import database
+import rate_limiter
 from pathlib import Path
 
 # ⚙️ НАЛАШТУВАННЯ
 BOT_TOKEN = "ВАШ_ТОКЕН_ТУТ"
 CHAT_ID = "ВАШ_ID_ТУТ"
+TELEGRAM_API = "https://api.telegram.org"
 BASE_DIR = Path(__file__).parent.resolve()
 DB_PATH = BASE_DIR / "cars.db"
 
 def init_tg_db():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        conn.execute("ALTER TABLE cars ADD COLUMN sent_to_tg INTEGER DEFAULT 0")
-    except:
-        pass
-    conn.close()
+    # sent_to_tg і частковий індекс idx_cars_unsent - міграції database.py
+    database.init(DB_PATH)
 
 def send_telegram_message(car):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto"
+    url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendPhoto"
     caption = f"🚗 <b>{car['title']}</b>\n💰 {car['price_uah']} грн\n🔗 {car['ad_url']}"
     
     payload = {'chat_id': CHAT_ID, 'caption': caption, 'parse_mode': 'HTML'}
@@ -28,41 +26,47 @@ def send_telegram_message(car):
     if car['image_url']:
         payload['photo'] = car['image_url']
         try:
-            requests.post(url, data=payload)
+            rate_limiter.request(requests, "POST", url, data=payload, timeout=15)
         except:
             # Якщо фото не вантажиться, шлемо текст
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+            url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendMessage"
             payload = {'chat_id': CHAT_ID, 'text': caption, 'parse_mode': 'HTML'}
-            requests.post(url, data=payload)
+            rate_limiter.request(requests, "POST", url, data=payload, timeout=15)
     else:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+        url = f"{TELEGRAM_API}/bot{BOT_TOKEN}/sendMessage"
         payload = {'chat_id': CHAT_ID, 'text': caption, 'parse_mode': 'HTML'}
-        requests.post(url, data=payload)
+        rate_limiter.request(requests, "POST", url, data=payload, timeout=15)
+
+def notify_pending(conn, limit=5, pause=1) -> int:
+    """Відправляє до `limit` ще не відправлених авто. Повертає кількість відправлених."""
+    cur = conn.cursor()
+    
+    # Беремо нові авто, які ще не відправляли
+    cur.execute("""
+        SELECT id, title, price_uah, ad_url, image_url FROM cars
+        WHERE sent_to_tg = 0 LIMIT ?
+    """, (limit,))
+    rows = cur.fetchall()
+    
+    sent = 0
+    for row in rows:
+        try:
+            send_telegram_message(row)
+            print(f"✈️ Відправлено: {row['title']}")
+            cur.execute("UPDATE cars SET sent_to_tg = 1 WHERE id = ?", (row['id'],))
+            conn.commit()
+            sent += 1
+            time.sleep(pause) # Пауза щоб не спамити
+        except Exception as e:
+            print(f"⚠️ Помилка відправки: {e}")
+    return sent
 
 def run_notifier():
     init_tg_db()
     print("📢 Telegram Notifier запущено...")
     
     while True:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        
-        # Беремо нові авто, які ще не відправляли
-        cur.execute("SELECT * FROM cars WHERE sent_to_tg = 0 OR sent_to_tg IS NULL LIMIT 5")
-        rows = cur.fetchall()
-        
-        for row in rows:
-            try:
-                send_telegram_message(row)
-                print(f"✈️ Відправлено: {row['title']}")
-                cur.execute("UPDATE cars SET sent_to_tg = 1 WHERE id = ?", (row['id'],))
-                conn.commit()
-                time.sleep(1) # Пауза щоб не спамити
-            except Exception as e:
-                print(f"⚠️ Помилка відправки: {e}")
-        
-        conn.close()
+        notify_pending(database.get_connection(DB_PATH))
         time.sleep(10) # Перевірка кожні 10 сек
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import database
+import price_stats
+
+
+# =============================
+# 🪦 ЗАКРИТІ ОГОЛОШЕННЯ
+# =============================
+# Коли збагачувач бачить 404 або status: closed, ID потрапляє в компактну таблицю
+# tombstones, а рядок у cars лишається з closed_at (soft-delete) для аналітики.
+# Монітор тримає всі ID у множині в пам'яті і не вставляє їх знову, навіть якщо
+# OLX підняв оголошення у видачі; черга збагачувача їх теж більше не бачить.
+# UI показує тільки рядки з closed_at IS NULL. Схема - міграція 6 у database.py.
+
+
+def bury(conn, car_id, reason: str, soft_delete: bool = True, closed_at: str = None):
+    """Позначає оголошення закритим. Виклик всередині транзакції того, хто знайшов закриття."""
+    closed_at = closed_at or datetime.now(timezone.utc).isoformat()
+    price_stats.remove_cars(conn, [car_id])  # поки рядок ще відкритий
+    conn.execute(
+        "INSERT OR IGNORE INTO tombstones (id, closed_at, reason) VALUES (?, ?, ?)",
+        (car_id, closed_at, reason),
+    )
+    if soft_delete:
+        conn.execute("UPDATE cars SET is_active = 0, closed_at = ? WHERE id = ?", (closed_at, car_id))
+    else:
+        # спершу cars: тригер cars_fts бере з car_details текст для видалення документа
+        conn.execute("DELETE FROM cars WHERE id = ?", (car_id,))
+        conn.execute("DELETE FROM car_details WHERE car_id = ?", (car_id,))
+
+
+class TombstoneSet:
+    """
+    Множина закритих ID у пам'яті. refresh() дочитує тільки нові записи
+    (closed_at > останнього баченого), тож її можна викликати кожного циклу.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.ids = set()
+        self.last_closed_at = ""
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> int:
+        conn = database.connect(self.db_path, row_factory=None)
+        try:
+            rows = conn.execute(
+                "SELECT id, closed_at FROM tombstones WHERE closed_at >= ?", (self.last_closed_at,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # таблиці ще немає
+        finally:
+            conn.close()
+
+        with self._lock:
+            before = len(self.ids)
+            for car_id, closed_at in rows:
+                self.ids.add(str(car_id))
+                self.last_closed_at = max(self.last_closed_at, closed_at)
+            return len(self.ids) - before
+
+    def __contains__(self, car_id) -> bool:
+        return str(car_id) in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
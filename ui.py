@@ -1,10 +1,14 @@
 import sqlite3
 from pathlib import Path
-from io import BytesIO
 
 import pandas as pd
 import streamlit as st
-import requests
+
+import car_details
+import database
+import image_cache
+import price_stats
+import search
 
 
 # =============================
@@ -30,6 +34,8 @@ def find_db_with_cars(base: Path) -> Path | None:
 
 DB_PATH = find_db_with_cars(BASE_DIR)
 TABLE = "cars"
+# columns the grid and filters use; description/params/photos are loaded per card on demand
+LISTING_COLUMNS = ("id", "title", "price_uah", "city_name", "region_name", "image_url", "ad_url", "created_at", "region_id")
 
 if DB_PATH is None:
     st.error("❌ SQLite DB with table `cars` not found")
@@ -51,27 +57,85 @@ st.caption(f"DB: {DB_PATH}")
 # =============================
 # LOAD DATA
 # =============================
+@st.cache_resource
+def get_connection(db_path: Path) -> sqlite3.Connection:
+    """One migrated connection for all reruns and sessions (read-only use)"""
+    conn = database.connect(db_path, row_factory=None, check_same_thread=False)
+    database.migrate(conn)
+    return conn
+
+
+@st.cache_data
+def load_regions(db_path: Path) -> pd.DataFrame:
+    conn = get_connection(db_path)
+    try:
+        return pd.read_sql_query(
+            f"""
+            SELECT region_id, MAX(region_name) AS region_name
+            FROM {TABLE}
+            WHERE region_id IS NOT NULL
+            GROUP BY region_id
+            ORDER BY region_name
+            """,
+            conn,
+        )
+    except Exception:
+        # typed location columns not migrated yet
+        return pd.DataFrame(columns=["region_id", "region_name"])
+
+
 @st.cache_data
-def load_data(db_path: Path) -> pd.DataFrame:
-    conn = sqlite3.connect(db_path)
-    df = pd.read_sql_query(f"SELECT * FROM {TABLE}", conn)
-    conn.close()
-    return df
+def load_data(db_path: Path, region_id: int | None = None) -> pd.DataFrame:
+    conn = get_connection(db_path)
+    columns = database.columns(conn, TABLE)
+    # closed ads stay in the table for analytics, but are not listed
+    where = ["closed_at IS NULL"]
+    params = []
+    if region_id is not None:
+        # index lookup on idx_cars_region_id instead of filtering in pandas
+        where.append("region_id = ?")
+        params.append(region_id)
+    query = f"SELECT {', '.join(col for col in LISTING_COLUMNS if col in columns)} FROM {TABLE}"
+    query += " WHERE " + " AND ".join(where)
+    return pd.read_sql_query(query, conn, params=params)
 
 
-df = load_data(DB_PATH)
+@st.cache_data
+def search_ids(db_path: Path, q: str, limit: int = -1) -> list:
+    """Ids matching q, best first (FTS5 over title, location, description and params); -1 = all"""
+    return [row[0] for row in search.ranked(get_connection(db_path), q, limit=limit)]
+
+
+st.sidebar.header("🔍 Filters")
+
+regions = load_regions(DB_PATH)
+region_names = dict(zip(regions["region_id"], regions["region_name"]))
+
+region_id = st.sidebar.selectbox(
+    "Region",
+    [None] + list(region_names),
+    format_func=lambda rid: "All Ukraine" if rid is None else region_names[rid],
+)
+
+df = load_data(DB_PATH, None if region_id is None else int(region_id))
 
 if df.empty:
     st.warning("Database is empty")
     st.stop()
 
+# market numbers come precomputed from price_stats, not from the dataframe
+market = price_stats.summary(get_connection(DB_PATH), None if region_id is None else int(region_id))
+if market["count"]:
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Active ads", f"{market['count']:,}")
+    c2.metric("Mean price", f"{market['mean']:,} UAH")
+    c3.metric("Median price (≈)", f"{market['median']:,} UAH")
+
 
 # =============================
 # SIDEBAR FILTERS
 # =============================
-st.sidebar.header("🔍 Filters")
-
-q = st.sidebar.text_input("Search (title / location)", "").strip()
+q = st.sidebar.text_input("Search (title / location / description / params)", "").strip()
 
 price_min = int(df["price_uah"].fillna(0).min())
 price_max = int(df["price_uah"].fillna(0).max())
@@ -85,7 +149,7 @@ price_range = st.sidebar.slider(
 
 sort = st.sidebar.selectbox(
     "Sort",
-    ["Newest", "Price ↑", "Price ↓"]
+    (["Relevance"] if q else []) + ["Newest", "Price ↑", "Price ↓"]
 )
 
 
@@ -95,17 +159,19 @@ sort = st.sidebar.selectbox(
 view = df.copy()
 
 if q:
-    view = view[
-        view["title"].str.contains(q, case=False, na=False)
-        | view["location"].str.contains(q, case=False, na=False)
-    ]
+    # index lookup instead of str.contains over every row on each rerun
+    matches = search_ids(DB_PATH, q)
+    view = view[view["id"].isin(matches)]
 
 view = view[
     (view["price_uah"].fillna(0) >= price_range[0])
     & (view["price_uah"].fillna(0) <= price_range[1])
 ]
 
-if sort == "Newest":
+if sort == "Relevance":
+    rank = {car_id: i for i, car_id in enumerate(matches)}
+    view = view.iloc[view["id"].map(rank).argsort()]
+elif sort == "Newest":
     view = view.sort_values("created_at", ascending=False)
 elif sort == "Price ↑":
     view = view.sort_values("price_uah", ascending=True)
@@ -140,12 +206,23 @@ def render_image(url: str):
     if not url:
         st.image("https://via.placeholder.com/400x300?text=No+Image")
         return
-    try:
-        r = requests.get(url, timeout=6)
-        r.raise_for_status()
-        st.image(BytesIO(r.content), use_container_width=True)
-    except Exception:
-        st.image("https://via.placeholder.com/400x300?text=Image+Error")
+    # local thumbnail if cached; otherwise the browser loads the CDN URL itself,
+    # the rerun never blocks on a download
+    path = image_cache.cache.lookup(url)
+    st.image(str(path) if path else url, use_container_width=True)
+
+
+# this page's thumbnails are cached in the background for the next rerun
+image_cache.cache.prefetch_async(page_df["image_url"].dropna())
+
+
+def render_details(car_id: str):
+    details = car_details.load(get_connection(DB_PATH), car_id)
+    if not details:
+        st.caption("Not enriched yet")
+        return
+    st.write(car_details.full_text(details) or "—")
+    st.json(details["params"] or "{}", expanded=False)
 
 
 # =============================
@@ -166,10 +243,13 @@ for i, row in enumerate(page_df.itertuples()):
         else:
             st.markdown("💰 —")
 
-        if row.location:
-            st.caption(f"📍 {row.location}")
+        location = ", ".join(part for part in (row.city_name, row.region_name) if isinstance(part, str))
+        if location:
+            st.caption(f"📍 {location}")
 
         st.markdown(f"[Open OLX ad]({row.ad_url})")
+        if st.button("Details", key=f"details-{row.id}"):
+            render_details(row.id)
         st.divider()
 
 